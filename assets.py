@@ -0,0 +1,37 @@
+import concurrent.futures
+import time
+
+
+class Assets:
+    def __init__(self, workers=2):
+        self.pool = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='assets')
+        self.started = time.perf_counter()
+        self.loaders = {}
+        self.futures = {}
+        # seconds from the start until each asset was ready, and the time callers spent blocked
+        self.loaded = {}
+        self.waited = 0.0
+
+    def load(self, name, loader):
+        # the pool starts them in the order they are added
+        self.loaders[name] = loader
+        self.futures[name] = self.pool.submit(self.run, name)
+
+    def run(self, name):
+        value = self.loaders[name]()
+        self.loaded[name] = time.perf_counter() - self.started
+        return value
+
+    def get(self, name):
+        future = self.futures[name]
+        start = time.perf_counter()
+        if future.cancel():
+            # still queued, loading it here beats waiting for the ones ahead of it
+            future = self.futures[name] = concurrent.futures.Future()
+            future.set_result(self.run(name))
+        value = future.result()
+        self.waited += time.perf_counter() - start
+        return value
+
+    def done(self):
+        return all(future.done() for future in self.futures.values())
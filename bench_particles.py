@@ -0,0 +1,91 @@
+import struct
+import sys
+import time
+
+import headless
+import vmath
+from particles import Particles
+from effects import Effects
+
+
+class ListParticles:
+    # the list based implementation Particles replaced, kept for comparison
+    def __init__(self, effects):
+        self.instance = struct.Struct('3f 4f 1f 3f')
+        self.instance_buffer = effects.stream.buffer
+        self.pipeline = effects.pipeline
+        self.instances = []
+
+    def add(self, position, velocity, rotation, scale, color):
+        self.instances.append([position, velocity, rotation, scale, color])
+
+    def update(self):
+        remove = False
+        for position, velocity, rotation, scale, color in self.instances:
+            position[0] += velocity[0]
+            position[1] += velocity[1]
+            position[2] += velocity[2]
+            velocity[2] -= 0.01
+            if position[2] < -1.0:
+                remove = True
+
+        if remove:
+            self.instances = [x for x in self.instances if x[0][2] >= -1.0]
+
+    def render(self):
+        data = bytearray()
+        for position, velocity, rotation, scale, color in self.instances:
+            data.extend(self.instance.pack(*position, *rotation, scale, *color))
+        self.instance_buffer.write(data)
+        self.pipeline.instance_count = len(self.instances)
+        self.pipeline.render()
+
+
+def run(ctx, emitter, renderer, count, frames):
+    for _ in range(count):
+        # high enough to stay alive for the whole run
+        position = [vmath.rand(-1.0, 1.0), vmath.rand(-1.0, 1.0), 1000.0]
+        velocity = list(vmath.qtransform(vmath.random_quaternion(), (vmath.rand(0.03, 0.12), 0.0, 0.0)))
+        emitter.add(position, velocity, vmath.random_quaternion(), vmath.rand(0.5, 1.0), (0.8, 0.0, 0.0))
+
+    update = 0.0
+    render = 0.0
+    for _ in range(frames):
+        ctx.new_frame()
+        a = time.perf_counter()
+        emitter.update()
+        b = time.perf_counter()
+        renderer.render()
+        c = time.perf_counter()
+        ctx.end_frame()
+        update += b - a
+        render += c - b
+
+    return update / frames * 1000.0, render / frames * 1000.0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    ctx = headless.init()
+    uniform_buffer = ctx.buffer(size=112, uniform=True)
+    image = ctx.image((64, 64), 'rgba8unorm')
+    depth = ctx.image((64, 64), 'depth24plus')
+
+    effects = Effects(uniform_buffer, 'assets/particle.bin', [image, depth], capacity=count)
+    gpu_effects = Effects(uniform_buffer, 'assets/particle.bin', [image, depth], capacity=count, gpu=True)
+    legacy = ListParticles(effects)
+    results = {
+        'list': run(ctx, legacy, legacy, count, frames),
+        'numpy': run(ctx, effects.register(Particles(count)), effects, count, frames),
+        'gpu': run(ctx, gpu_effects.register(Particles(gpu=True, stream=gpu_effects.stream)), gpu_effects, count, frames),
+    }
+
+    print(f'{count} live particles, {frames} frames')
+    for name, (update, render) in results.items():
+        print(f'{name:>6}: update {update:8.3f} ms  render {render:8.3f} ms  total {update + render:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import sys
+import time
+
+import numpy as np
+import vmath
+
+
+def inputs(n, rng):
+    return {
+        'a': vmath.random_quaternions(n, rng),
+        'b': vmath.random_quaternions(n, rng),
+        'u': rng.uniform(-1.0, 1.0, (n, 3)),
+        'v': rng.uniform(-1.0, 1.0, (n, 3)),
+        'w': rng.uniform(-1.0, 1.0, (n, 3)) + 3.0,
+        't': rng.uniform(-3.0, 3.0, n),
+    }
+
+
+FUNCTIONS = {
+    'quatmul': (
+        lambda x: [vmath.quatmul(a, b) for a, b in zip(x['a'], x['b'])],
+        lambda x: vmath.quatmul_array(x['a'], x['b']),
+    ),
+    'qtransform': (
+        lambda x: [vmath.qtransform(a, u) for a, u in zip(x['a'], x['u'])],
+        lambda x: vmath.qtransform_array(x['a'], x['u']),
+    ),
+    'axis_angle': (
+        lambda x: [vmath.axis_angle(u, t) for u, t in zip(x['u'], x['t'])],
+        lambda x: vmath.axis_angle_array(x['u'], x['t']),
+    ),
+    'point_line_distance': (
+        lambda x: [vmath.point_line_distance(u, v, w) for u, v, w in zip(x['u'], x['v'], x['w'])],
+        lambda x: vmath.point_line_distance_array(x['u'], x['v'], x['w']),
+    ),
+    'add': (
+        lambda x: [vmath.add(u, v) for u, v in zip(x['u'], x['v'])],
+        lambda x: vmath.add_array(x['u'], x['v']),
+    ),
+    'random_quaternion': (
+        lambda x: [vmath.random_quaternion() for _ in range(len(x['t']))],
+        lambda x: vmath.random_quaternions(len(x['t']), np.random.default_rng(1)),
+    ),
+}
+
+
+def timeit(func, x):
+    start = time.perf_counter()
+    func(x)
+    return time.perf_counter() - start
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [1, 100, 10000, 1000000]
+    # test_vmath.py checks that both versions agree, this only measures throughput
+    print(f'{"items per second":>20}' + ''.join(f'{n:>24}' for n in sizes))
+    for name, (scalar, array) in FUNCTIONS.items():
+        row = f'{name:>20}'
+        for n in sizes:
+            x = inputs(n, np.random.default_rng(0))
+            repeat = max(1, 10000 // n)
+            s = min(timeit(scalar, x) for _ in range(repeat))
+            a = min(timeit(array, x) for _ in range(repeat))
+            row += f'{n / s:>11.2e} / {n / a:>10.2e}'
+        print(row)
+    print(f'{"":>20}  scalar / array')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+import pygame
+
+import headless
+import glstats
+import shaders
+from recorder import Replay
+
+# a recording only replays the same at the size it was made at
+recording = Replay(sys.argv[sys.argv.index('--replay') + 1]) if '--replay' in sys.argv else None
+if recording and '--size' not in sys.argv:
+    sys.argv += ['--size', f'{recording.size[0]}x{recording.size[1]}']
+
+ctx = headless.init(lambda loader: glstats.CountingLoader(shaders.ProgramCache(loader)))
+
+import vmath
+import main as game
+
+
+def project(position):
+    # world position to window pixels, the inverse of the mouse mapping in the scenes
+    mat = np.frombuffer(game.camera.matrix, 'f4').reshape(4, 4).T
+    x, y, z, w = mat @ (*position, 1.0)
+    return int((x / w + 1.0) * 0.5 * game.size[0]), int((1.0 - y / w) * 0.5 * game.size[1])
+
+
+def idle(scene, frame):
+    return set(), (game.size[0] // 2, game.size[1] // 2)
+
+
+def hover_start(scene, frame):
+    # over the start sign without clicking it
+    return set(), (game.size[0] // 2, int(game.size[1] * 0.42))
+
+
+def shoot_fish(scene, frame):
+    # hold the trigger for 3 frames out of every 10, aiming at the first visible fish
+    mouse = (game.size[0] // 2, game.size[1] // 2)
+    visible = np.flatnonzero(scene.fishes.visible_fishes)
+    if len(visible):
+        mouse = project(scene.fishes.positions[visible[0]])
+    return {'mouse1'} if frame % 10 < 3 else set(), mouse
+
+
+def visible_fishes():
+    fishes = game.Fishes(game.fish_count)
+    fishes.visible_fishes[:] = True
+    return fishes
+
+
+SCENES = {
+    'press_any_key': (lambda: game.ScenePressAnyKey(), idle),
+    'fade_in': (lambda: game.SceneFadeIn(), hover_start),
+    'intro': (lambda: game.SceneIntro(), idle),
+    'play': (lambda: game.ScenePlay(), shoot_fish),
+    'fade_out_win': (lambda: game.SceneFadeOutWin(visible_fishes()), idle),
+    'fade_out_loose': (lambda: game.SceneFadeOutLoose(visible_fishes()), idle),
+}
+
+
+def percentiles(values):
+    values = np.array(values) * 1000.0
+    return {
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p90': float(np.percentile(values, 90)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+
+class Measure:
+    def __init__(self):
+        self.times = []
+        self.draw_calls = []
+        self.vertices = []
+        self.uploads = []
+        self.commands = []
+        if game.profiler:
+            game.profiler.reset()
+
+    def frame(self, render):
+        glstats.counters.reset()
+        start = time.perf_counter()
+        render()
+        self.times.append(time.perf_counter() - start)
+        self.draw_calls.append(glstats.counters.draw_calls)
+        self.vertices.append(glstats.counters.vertices)
+        self.uploads.append(glstats.counters.bytes_uploaded)
+        self.commands.append(game.commands.counts)
+
+    def report(self):
+        passes = None
+        if game.profiler:
+            game.profiler.flush()
+            passes = game.profiler.stats()
+
+        return {
+            'frames': len(self.times),
+            'cpu_frame_ms': percentiles(self.times),
+            'draw_calls_per_frame': float(np.mean(self.draw_calls)),
+            'vertices_per_frame': float(np.mean(self.vertices)),
+            'bytes_uploaded_per_frame': float(np.mean(self.uploads)),
+            'bytes_uploaded': int(np.sum(self.uploads)),
+            'commands_per_frame': {name: float(np.mean([x.get(name, 0) for x in self.commands])) for name in dict.fromkeys(k for x in self.commands for k in x)},
+            'final_scene': type(game.g.scene).__name__,
+            'hits': getattr(game.g.scene, 'hits', None),
+            'particles': game.particles.count,
+            'smoke': game.smoke.count,
+            'passes': passes,
+        }
+
+
+def reset(seed, scene):
+    vmath.seed(seed)
+    game.g.ticks = 0
+    game.g.first_tick = 0
+    game.g.now = 0.0
+    game.g.keys = set()
+    game.clock.reset(0.0)
+    # particles outlive the scene that spawned them, each scene starts from none
+    game.effects.clear()
+    game.g.scene = scene()
+
+
+def run_scene(name, frames, step, seed):
+    make_scene, script = SCENES[name]
+    reset(seed, make_scene)
+
+    measure = Measure()
+    for frame in range(frames):
+        game.g.keys, game.g.mouse = script(game.g.scene, frame)
+        game.g.ticks = round(frame * step * 1000.0)
+        game.g.now = (game.g.ticks - game.g.first_tick) / 1000.0
+        measure.frame(game.render_frame)
+    return measure.report()
+
+
+def state_digest():
+    # fingerprints the gameplay state, equal digests mean the replay matched bit for bit
+    digest = hashlib.sha1()
+    fishes = getattr(game.g.scene, 'fishes', None)
+    if fishes:
+        digest.update(fishes.instances.tobytes())
+        digest.update(fishes.visible_fishes.tobytes())
+    digest.update(game.effects.stream.data[:game.effects.stream.count].tobytes())
+    return digest.hexdigest()
+
+
+def run_replay():
+    reset(recording.seed, game.ScenePressAnyKey)
+
+    measure = Measure()
+    for ticks, mouse, events in recording:
+        if any(event.type == pygame.QUIT for event in events):
+            break
+        measure.frame(lambda: game.tick(ticks, mouse, events))
+    report = measure.report()
+    report['digest'] = state_digest()
+    return report
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    frames = game.option('--frames', 120)
+    step = 1.0 / game.option('--rate', 60.0)
+    seed = game.option('--seed', 0)
+    names = game.option('--scenes', ','.join(SCENES)).split(',')
+
+    report = {
+        'commit': commit(),
+        # the headless context runs on llvmpipe, the renderer and mesa version are what results compare against
+        'renderer': ctx.info['renderer'],
+        'gl_version': ctx.info['version'],
+        'size': list(game.size),
+        'fish': game.fish_count,
+        'gpu_particles': game.gpu_particles,
+        'lods': game.lods,
+        'indexed': game.indexed,
+        'frames': frames,
+        'timestep': step,
+        'seed': seed,
+        'shaders': vars(shaders.stats),
+        'warm_up_ms': game.warm_up(),
+    }
+
+    if recording:
+        report['seed'] = recording.seed
+        report['frames'] = len(recording)
+        report['scenes'] = {'replay': run_replay()}
+    else:
+        report['scenes'] = {name: run_scene(name, frames, step, seed) for name in names}
+
+    if game.profiler and '--profile-output' in sys.argv:
+        game.profiler.dump(game.option('--profile-output', ''))
+
+    output = json.dumps(report, indent=2)
+    if '--output' in sys.argv:
+        with open(game.option('--output', ''), 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+import pygame
+
+import indexed_mesh
+import lod
+
+MAGIC = b'FISHPAK1'
+HEADER = struct.Struct('<8sI')
+ALIGN = 16
+PATH = 'assets.pak'
+
+
+class Bundle:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_size = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an asset bundle')
+        self.index = json.loads(self.map[HEADER.size:HEADER.size + index_size])
+        self.data = memoryview(self.map)
+        self.stale = set()
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def current(self, name):
+        # an entry is only used while its loose source is the one it was built from, edits win over an old pack
+        # a pack shipped without the loose files is always current
+        if name not in self.index:
+            return False
+        try:
+            source = stamp(name)
+        except OSError:
+            return True
+        if source == self.index[name].get('source'):
+            return True
+        with lock:
+            if name not in self.stale:
+                self.stale.add(name)
+                print(f'{name} changed since {PATH} was built, loading the loose file, run bundle.py to rebuild it', file=sys.stderr)
+        return False
+
+    def view(self, name):
+        entry = self.index[name]
+        return self.data[entry['offset']:entry['offset'] + entry['size']]
+
+    def entry(self, name):
+        return self.index[name]
+
+
+def stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+lock = threading.Lock()
+opened = False
+current = None
+
+
+def get():
+    # opened on first use from whichever thread asks first, the game runs from loose files without one
+    global opened, current
+    with lock:
+        if not opened:
+            opened = True
+            if os.path.exists(PATH):
+                current = Bundle(PATH)
+    return current
+
+
+def read(path):
+    pack = get()
+    if pack and pack.current(path):
+        return pack.view(path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def text(path):
+    pack = get()
+    if pack and pack.current(path):
+        return str(pack.view(path), 'utf-8')
+    with open(path) as f:
+        return f.read()
+
+
+def image(path):
+    pack = get()
+    if pack and pack.current(path):
+        entry = pack.entry(path)
+        return (entry['width'], entry['height']), pack.view(path)
+    img = pygame.image.load(path)
+    return img.get_size(), pygame.image.tobytes(img, 'RGBA', True)
+
+
+def sound(path):
+    # decoded pcm is only usable when the mixer runs in the format it was decoded to
+    pack = get()
+    if pack and pack.current(path) and tuple(pack.entry(path)['mixer']) == pygame.mixer.get_init():
+        return pygame.mixer.Sound(buffer=pack.view(path))
+    return pygame.mixer.Sound(path)
+
+
+def build(output, audio=False):
+    # the generated meshes are packed as well, bring them up to date with their sources first
+    lod.update()
+    indexed_mesh.update()
+
+    entries = []
+    for path in sorted(glob.glob('assets/*.bin')):
+        with open(path, 'rb') as f:
+            entries.append((path, {'kind': 'mesh'}, f.read()))
+
+    for path in sorted(glob.glob('assets/*.mesh')):
+        with open(path, 'rb') as f:
+            entries.append((path, {'kind': 'indexed_mesh'}, f.read()))
+
+    for path in sorted(glob.glob('assets/*.json')):
+        with open(path, 'rb') as f:
+            entries.append((path, {'kind': 'data'}, f.read()))
+
+    for path in sorted(glob.glob('shaders/*')):
+        with open(path, 'rb') as f:
+            entries.append((path.replace(os.sep, '/'), {'kind': 'shader'}, f.read()))
+
+    # stored the way load_texture uploads them, rgba and bottom row first
+    for path in sorted(glob.glob('assets/*.png')):
+        img = pygame.image.load(path)
+        width, height = img.get_size()
+        entries.append((path, {'kind': 'image', 'width': width, 'height': height}, pygame.image.tobytes(img, 'RGBA', True)))
+
+    if audio:
+        pygame.mixer.init()
+        for path in sorted(glob.glob('assets/*.ogg')):
+            if path == 'assets/metal.ogg':
+                # the music streams from its file
+                continue
+            pcm = pygame.mixer.Sound(path).get_raw()
+            entries.append((path, {'kind': 'sound', 'mixer': pygame.mixer.get_init()}, pcm))
+
+    # the modification time and size of each source file, an entry whose source changed since is not used
+    entries = [(path.replace(os.sep, '/'), {**entry, 'source': stamp(path)}, data) for path, entry, data in entries]
+
+    # the index stores absolute offsets, its own size depends on them so lay out until it settles
+    index_size = 0
+    while True:
+        offset = HEADER.size + index_size
+        index = {}
+        for path, entry, data in entries:
+            offset = (offset + ALIGN - 1) // ALIGN * ALIGN
+            index[path] = {**entry, 'offset': offset, 'size': len(data)}
+            offset += len(data)
+        encoded = json.dumps(index).encode()
+        if len(encoded) <= index_size:
+            encoded = encoded.ljust(index_size)
+            break
+        index_size = len(encoded)
+
+    with open(output, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, index_size))
+        f.write(encoded)
+        for path, entry, data in entries:
+            f.write(b'\0' * (index[path]['offset'] - f.tell()))
+            f.write(data)
+
+    print(f'{output}: {len(entries)} entries, {os.path.getsize(output)} bytes')
+
+
+if __name__ == '__main__':
+    args = [x for x in sys.argv[1:] if not x.startswith('--')]
+    build(args[0] if args else PATH, audio='--audio' in sys.argv)
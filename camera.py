@@ -0,0 +1,74 @@
+import numpy as np
+import zengl
+
+
+class Camera:
+    def __init__(self, eye, target=(0.0, 0.0, 0.0), fov=45.0, aspect=1.0):
+        self.eye = tuple(eye)
+        self.target = tuple(target)
+        self.fov = fov
+        self.aspect = aspect
+        self.looked = None
+        self.matrix_key = None
+        self.inverse_key = None
+        self.planes_key = None
+        self.recomputed = 0
+
+    def key(self):
+        return self.eye, self.target, self.fov, self.aspect
+
+    def look(self, target=None, fov=None, eye=None, aspect=None):
+        # returns True when the camera changed since the previous call
+        self.eye = self.eye if eye is None else tuple(eye)
+        self.target = self.target if target is None else tuple(target)
+        self.fov = self.fov if fov is None else fov
+        self.aspect = self.aspect if aspect is None else aspect
+        changed = self.looked != self.key()
+        self.looked = self.key()
+        return changed
+
+    @property
+    def matrix(self):
+        if self.matrix_key != self.key():
+            self.matrix_key = self.key()
+            self.cached_matrix = zengl.camera(self.eye, self.target, aspect=self.aspect, fov=self.fov)
+            self.recomputed += 1
+        return self.cached_matrix
+
+    @property
+    def inverse(self):
+        if self.inverse_key != self.key():
+            self.inverse_key = self.key()
+            mat = np.frombuffer(self.matrix, dtype='f4').reshape(4, 4).T
+            self.cached_inverse = np.linalg.inv(mat)
+        return self.cached_inverse
+
+    @property
+    def planes(self):
+        # the six frustum planes as rows of a, b, c, d with unit normals pointing inwards
+        if self.planes_key != self.key():
+            self.planes_key = self.key()
+            mat = np.frombuffer(self.matrix, dtype='f4').reshape(4, 4).T.astype('f8')
+            planes = np.array([mat[3] + mat[0], mat[3] - mat[0], mat[3] + mat[1], mat[3] - mat[1], mat[3] + mat[2], mat[3] - mat[2]])
+            self.cached_planes = planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+        return self.cached_planes
+
+    def spheres_visible(self, centers, radius):
+        # centers is an n by 3 array, radius a scalar or one per sphere, spheres touching the frustum count as visible
+        planes = self.planes
+        distances = np.asarray(centers) @ planes[:, :3].T + planes[:, 3]
+        return np.all(distances >= -np.reshape(radius, (-1, 1)), axis=1)
+
+    def box_visible(self, lower, upper):
+        # tests the corner furthest along each plane normal, boxes crossing a frustum corner may pass
+        planes = self.planes
+        corners = np.where(planes[:, :3] >= 0.0, upper, lower)
+        return bool(np.all(np.sum(corners * planes[:, :3], axis=1) + planes[:, 3] >= 0.0))
+
+    def unproject(self, x, y):
+        # screen points in ndc, scalars or arrays, to points on the near and far planes
+        x, y = np.broadcast_arrays(np.asarray(x, 'f8'), np.asarray(y, 'f8'))
+        one = np.ones_like(x)
+        a = np.stack([x, y, -one, one], axis=-1) @ self.inverse.T
+        b = np.stack([x, y, one, one], axis=-1) @ self.inverse.T
+        return a[..., :3] / a[..., 3:], b[..., :3] / b[..., 3:]
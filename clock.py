@@ -0,0 +1,33 @@
+class Clock:
+    def __init__(self, rate=60.0, max_steps=5):
+        self.rate = rate
+        self.dt = 1.0 / rate
+        # after a stall the simulation drops the backlog instead of racing to catch up
+        self.max_steps = max_steps
+        self.reset(0.0)
+
+    def reset(self, now):
+        self.origin = now
+        self.ticks = 0
+        self.alpha = 1.0
+
+    @property
+    def time(self):
+        return self.origin + self.ticks * self.dt
+
+    @property
+    def render_time(self):
+        # rendering trails the simulation by one step and blends the last two states
+        return self.time + (self.alpha - 1.0) * self.dt
+
+    def advance(self, now):
+        if now < self.time:
+            self.reset(now)
+        due = int((now - self.origin) * self.rate)
+        if due - self.ticks > self.max_steps:
+            self.origin += (due - self.ticks - self.max_steps) * self.dt
+            due = self.ticks + self.max_steps
+        times = [self.origin + tick * self.dt for tick in range(self.ticks + 1, due + 1)]
+        self.ticks = due
+        self.alpha = min(max((now - self.time) * self.rate, 0.0), 1.0)
+        return times
@@ -0,0 +1,113 @@
+class Commands:
+    # scenes record a frame here and submit plays it back
+    # writes that would not change anything are dropped, opaque draws go first and front to back
+    def __init__(self):
+        self.writes = []
+        self.opaque = []
+        self.ordered = []
+        self.written = {}
+        self.visibility = {}
+        self.counts = self.reset_counts()
+
+    def reset_counts(self):
+        return {
+            'draws': 0,
+            'merged_draws': 0,
+            'pipeline_changes': 0,
+            'uniform_writes': 0,
+            'buffer_writes': 0,
+            'skipped_writes': 0,
+            'bytes_written': 0,
+        }
+
+    def write(self, buffer, data, offset=0):
+        # writes land before any draw of the frame, a frame writes each range once
+        self.writes.append((buffer, bytes(data), offset))
+
+    def draw(self, pipeline, uniforms=None, depth=None, instances=None, vertices=None):
+        # anything with uniforms and a render method, draws without a depth keep their order after the opaque ones
+        # vertices is a first vertex and count for pipelines that hold several meshes
+        command = (pipeline, uniforms or {}, instances, vertices)
+        if depth is None:
+            self.ordered.append((self.render, command))
+        else:
+            self.opaque.append((depth, command))
+
+    def cull(self, name, drawn, culled):
+        # objects or instances the frustum test kept and dropped, reported as name_drawn and name_culled
+        totals = self.visibility.setdefault(name, [0, 0])
+        totals[0] += drawn
+        totals[1] += culled
+
+    def call(self, function, *args):
+        self.ordered.append((function, args))
+
+    def render(self, pipeline, uniforms, instances, vertices):
+        counts = self.counts
+        for name, data in uniforms.items():
+            view = pipeline.uniforms[name]
+            if view.tobytes() == data:
+                counts['skipped_writes'] += 1
+                continue
+            view[:] = data
+            counts['uniform_writes'] += 1
+            counts['bytes_written'] += len(data)
+        if instances is not None:
+            pipeline.instance_count = instances
+        if vertices is not None:
+            pipeline.first_vertex, pipeline.vertex_count = vertices
+        if pipeline is not self.pipeline:
+            self.pipeline = pipeline
+            counts['pipeline_changes'] += 1
+        counts['draws'] += 1
+        pipeline.render()
+
+    def merge(self, commands):
+        # draws of one pipeline with the same state and touching vertex ranges go out as one, which is what makes a static batch a single draw
+        merged = [commands[0]]
+        for command in commands[1:]:
+            pipeline, uniforms, instances, vertices = merged[-1]
+            if vertices and command[3] and command[1:3] == (uniforms, instances):
+                first, count = vertices
+                other_first, other_count = command[3]
+                if first + count == other_first or other_first + other_count == first:
+                    merged[-1] = (pipeline, uniforms, instances, (min(first, other_first), count + other_count))
+                    self.counts['merged_draws'] += 1
+                    continue
+            merged.append(command)
+        return merged
+
+    def submit(self):
+        counts = self.counts = self.reset_counts()
+        self.pipeline = None
+
+        for buffer, data, offset in self.writes:
+            key = buffer, offset
+            if self.written.get(key) == data:
+                counts['skipped_writes'] += 1
+                continue
+            buffer.write(data, offset=offset)
+            self.written[key] = data
+            counts['buffer_writes'] += 1
+            counts['bytes_written'] += len(data)
+
+        # pipelines take turns by their nearest draw so one pipeline's draws stay together
+        groups = {}
+        for depth, command in sorted(self.opaque, key=lambda x: x[0]):
+            groups.setdefault(command[0], []).append(command)
+        for commands in groups.values():
+            for command in self.merge(commands):
+                self.render(*command)
+
+        for function, args in self.ordered:
+            function(*args)
+
+        for name, (drawn, culled) in self.visibility.items():
+            counts[f'{name}_drawn'] = drawn
+            counts[f'{name}_culled'] = culled
+
+        self.writes.clear()
+        self.opaque.clear()
+        self.ordered.clear()
+        self.visibility.clear()
+        return counts
@@ -0,0 +1,122 @@
+import zengl
+
+import shaders
+from mesh import load_model, bounds, levels
+from particles import CPU_LAYOUT, GPU_LAYOUT, RATE, expiry
+from stream import InstanceStream
+
+
+class Effects:
+    def __init__(self, uniform_buffer, model, framebuffer, capacity=1024, max_capacity=None, drop_oldest=True, gpu=False, indexed=False):
+        self.uniform_buffer = uniform_buffer
+        self.framebuffer = framebuffer
+        self.gpu = gpu
+        self.geometry = load_model(model, indexed=indexed)
+        self.bounds = bounds[model]
+        self.vertex_count = levels[model][0][1]
+        if gpu:
+            # gpu emitters allocate straight from this ring, the limits apply to all of them together
+            self.stream = InstanceStream(GPU_LAYOUT, capacity, max_capacity or capacity, drop_oldest, ring=True, expires=expiry)
+        else:
+            # cpu emitters enforce their own limits, the merged stream only has to fit them all
+            self.stream = InstanceStream(CPU_LAYOUT, capacity, max_capacity)
+        self.stream.upload()
+        self.emitters = []
+        self.now = 0.0
+        self.drawn = 0
+        self.culled = 0
+        self.viewport = (0, 0, *framebuffer[0].size)
+        self.pipeline = self.make_pipeline()
+        self.pipeline_buffer = self.stream.buffer
+
+    def make_pipeline(self):
+        ctx = zengl.context()
+        attributes = (2, 3, 4, 5, 6, 7, 8, 9) if self.gpu else (2, 3, 4, 5)
+        pipeline = ctx.pipeline(
+            vertex_shader=shaders.source('shaders/particles.vert'),
+            fragment_shader=shaders.source('shaders/particles.frag'),
+            layout=[
+                {
+                    'name': 'Common',
+                    'binding': 0,
+                },
+            ],
+            resources=[
+                {
+                    'type': 'uniform_buffer',
+                    'binding': 0,
+                    'buffer': self.uniform_buffer,
+                },
+            ],
+            includes={
+                'particles_mode': '#define GPU_SIMULATION' if self.gpu else '',
+            },
+            framebuffer=self.framebuffer,
+            topology='triangles',
+            cull_face='back',
+            vertex_buffers=[
+                *zengl.bind(self.geometry.vertex_buffer, self.geometry.layout, 0, 1, -1),
+                *zengl.bind(self.stream.buffer, self.stream.layout + ' /i', *attributes),
+            ],
+            index_buffer=self.geometry.index_buffer,
+            short_index=self.geometry.short_index,
+            vertex_count=self.vertex_count,
+        )
+        # warmed as it is built, the pipeline rebuilt on buffer growth has its first-use work done before its first real draw
+        shaders.warm(pipeline, instances=1)
+        return pipeline
+
+    def set_viewport(self, viewport):
+        # kept so the pipeline rebuilt on buffer growth renders to the same area
+        self.viewport = viewport
+        self.pipeline.viewport = viewport
+
+    def register(self, emitter):
+        if emitter.gpu != self.gpu:
+            raise ValueError('emitter and effects must use the same simulation mode')
+        if self.gpu and emitter.stream is not self.stream:
+            raise ValueError('gpu emitters have to be created with stream=effects.stream')
+        self.emitters.append(emitter)
+        return emitter
+
+    def clear(self):
+        self.stream.clear()
+        for emitter in self.emitters:
+            emitter.stream.clear()
+
+    def update(self, now, dt=1.0 / RATE):
+        self.now = now
+        for emitter in self.emitters:
+            emitter.update(now, dt)
+
+    def render(self, alpha=1.0, visible=None):
+        # visible takes sphere centers and radii and returns a mask, gpu particles only know their position in the shader
+        self.culled = 0
+        if not self.gpu:
+            self.stream.clear()
+            for emitter in self.emitters:
+                n = emitter.count
+                data = emitter.stream.data[:n]
+                positions = data[:, 0:3]
+                if alpha != 1.0:
+                    # blends the last two simulation steps, gpu mode gets the same from the time uniform
+                    positions = emitter.previous[:n] + (positions - emitter.previous[:n]) * alpha
+                if visible:
+                    mask = visible(positions, emitter.scale[:n] * self.bounds.extent)
+                    data, positions = data[mask], positions[mask]
+                    self.culled += n - len(data)
+                i = self.stream.allocate(len(data))
+                self.stream.data[i] = data
+                self.stream.data[i, 0:3] = positions
+
+        self.stream.upload()
+        if self.pipeline_buffer is not self.stream.buffer:
+            # the stream reallocated its buffer, the vertex bindings have to follow
+            zengl.context().release(self.pipeline)
+            self.pipeline = self.make_pipeline()
+            self.pipeline.viewport = self.viewport
+            self.pipeline_buffer = self.stream.buffer
+        # the ring draws every slot it has written, the expired ones collapse in the vertex shader
+        self.drawn = int(self.stream.alive(self.now).sum()) if self.gpu else self.stream.count
+        self.pipeline.instance_count = self.stream.count
+        self.pipeline.render()
@@ -0,0 +1,101 @@
+import ctypes
+
+GLenum = ctypes.c_uint
+GLint = ctypes.c_int
+GLsizei = ctypes.c_int
+GLintptr = ctypes.c_ssize_t
+GLsizeiptr = ctypes.c_ssize_t
+GLvoidp = ctypes.c_void_p
+
+SIGNATURES = {
+    'glDrawArraysInstanced': (GLenum, GLint, GLsizei, GLsizei),
+    'glDrawElementsInstanced': (GLenum, GLsizei, GLenum, GLvoidp, GLsizei),
+    'glBufferData': (GLenum, GLsizeiptr, GLvoidp, GLenum),
+    'glBufferSubData': (GLenum, GLintptr, GLsizeiptr, GLvoidp),
+    'glTexSubImage2D': (GLenum, GLint, GLint, GLint, GLsizei, GLsizei, GLenum, GLenum, GLvoidp),
+    'glBlitFramebuffer': (GLint, GLint, GLint, GLint, GLint, GLint, GLint, GLint, ctypes.c_uint, GLenum),
+}
+
+
+class Counters:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.draw_calls = 0
+        self.vertices = 0
+        self.bytes_uploaded = 0
+        self.blits = 0
+
+    def snapshot(self):
+        return {
+            'draw_calls': self.draw_calls,
+            'vertices': self.vertices,
+            'bytes_uploaded': self.bytes_uploaded,
+            'blits': self.blits,
+        }
+
+
+counters = Counters()
+
+
+def draw_arrays(mode, first, count, instances):
+    counters.draw_calls += 1
+    counters.vertices += count * max(instances, 1)
+
+
+def draw_elements(mode, count, index_type, offset, instances):
+    counters.draw_calls += 1
+    counters.vertices += count * max(instances, 1)
+
+
+def buffer_data(target, size, data, usage):
+    if data:
+        counters.bytes_uploaded += size
+
+
+def buffer_sub_data(target, offset, size, data):
+    counters.bytes_uploaded += size
+
+
+def tex_sub_image(target, level, x, y, width, height, format, pixel_type, pixels):
+    # every image the game uploads is rgba8
+    counters.bytes_uploaded += width * height * 4
+
+
+def blit_framebuffer(*args):
+    counters.blits += 1
+
+
+HOOKS = {
+    'glDrawArraysInstanced': draw_arrays,
+    'glDrawElementsInstanced': draw_elements,
+    'glBufferData': buffer_data,
+    'glBufferSubData': buffer_sub_data,
+    'glTexSubImage2D': tex_sub_image,
+    'glBlitFramebuffer': blit_framebuffer,
+}
+
+
+class CountingLoader:
+    # wraps a zengl loader and counts the gl calls that cost draw calls and upload bandwidth
+    def __init__(self, loader):
+        self.loader = loader
+        self.wrappers = []
+
+    def load_opengl_function(self, name):
+        address = self.loader.load_opengl_function(name)
+        if name not in HOOKS or not address:
+            return address
+
+        prototype = ctypes.CFUNCTYPE(None, *SIGNATURES[name])
+        original = prototype(address)
+        hook = HOOKS[name]
+
+        def wrapper(*args):
+            hook(*args)
+            original(*args)
+
+        wrapper = prototype(wrapper)
+        self.wrappers.append((original, wrapper))
+        return ctypes.cast(wrapper, ctypes.c_void_p).value
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import zengl
+
+
+class EglLoader:
+    def __init__(self):
+        import glcontext
+        self.extra = glcontext.get_backend_by_name('egl')(glversion=330, mode='standalone')
+
+    def load_opengl_function(self, name):
+        return self.extra.load_opengl_function(name)
+
+
+def force_software():
+    # numbers only compare across machines and commits on the same rasterizer, mesa's llvmpipe runs anywhere
+    # read by mesa when the display is created, so this has to happen before the loader, already set values win
+    os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+    os.environ.setdefault('GALLIUM_DRIVER', 'llvmpipe')
+    os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+
+def loader():
+    try:
+        return zengl.loader(headless=True)
+    except Exception:
+        return EglLoader()
+
+
+def init(wrap=None, software=True):
+    if software:
+        force_software()
+    zengl.init(wrap(loader()) if wrap else loader())
+    ctx = zengl.context()
+    if software and 'llvmpipe' not in ctx.info['renderer']:
+        print(f'warning: running on {ctx.info["renderer"]} instead of llvmpipe, results only compare with the same renderer', file=sys.stderr)
+    return ctx
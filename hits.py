@@ -0,0 +1,49 @@
+import numpy as np
+import vmath
+
+
+class LaneGrid:
+    def __init__(self, lanes, spread, x_range):
+        # every centre lies within spread of its lane along y and inside x_range, lanes are sorted
+        self.lanes = np.asarray(lanes)
+        self.spread = spread
+        self.x_range = x_range
+
+    def candidates(self, origins, targets, radius):
+        d = targets - origins
+        x0, x1 = self.x_range[0] - radius, self.x_range[1] + radius
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t0 = (x0 - origins[:, 0]) / d[:, 0]
+            t1 = (x1 - origins[:, 0]) / d[:, 0]
+        # the y span of each line while it crosses the slab of centres
+        y0 = origins[:, 1] + d[:, 1] * t0
+        y1 = origins[:, 1] + d[:, 1] * t1
+        margin = radius + self.spread
+        low = np.where(d[:, 0] != 0.0, np.minimum(y0, y1) - margin, -np.inf)
+        high = np.where(d[:, 0] != 0.0, np.maximum(y0, y1) + margin, np.inf)
+        first = np.searchsorted(self.lanes, low, 'left')
+        last = np.searchsorted(self.lanes, high, 'right')
+        counts = last - first
+        rays = np.repeat(np.arange(len(origins)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return rays, np.repeat(first, counts) + offsets
+
+
+def ray_hits(centers, radius, origins, targets, mask=None, grid=None):
+    # (ray, centre) index pairs where the line through origin and target passes within radius of the centre
+    centers = np.asarray(centers)
+    origins = np.atleast_2d(np.asarray(origins, 'f8'))
+    targets = np.atleast_2d(np.asarray(targets, 'f8'))
+
+    if grid is not None:
+        rays, fishes = grid.candidates(origins, targets, radius)
+    else:
+        rays, fishes = np.indices((len(origins), len(centers))).reshape(2, -1)
+
+    if mask is not None:
+        keep = mask[fishes]
+        rays, fishes = rays[keep], fishes[keep]
+
+    distance = vmath.point_line_distance_array(centers[fishes], origins[rays], targets[rays])
+    keep = distance < radius
+    return rays[keep], fishes[keep]
@@ -0,0 +1,197 @@
+import glob
+import hashlib
+import os
+import struct
+import sys
+
+import numpy as np
+
+# a position, a normal as signed bytes and a color as unsigned bytes, 20 bytes instead of the 36 of the source meshes
+LAYOUT = '3f 4ni1 4nu1'
+VERTEX = np.dtype([('position', '<f4', 3), ('normal', 'i1', 4), ('color', 'u1', 4)])
+# the header carries a sha1 of the source mesh, a .mesh built from an older version of it is converted again
+HEADER = struct.Struct('<4sII20s')
+MAGIC = b'IMS2'
+# the post-transform cache both the optimisation and the statistics model, least recently used first out
+CACHE_SIZE = 32
+
+
+def mesh_path(model):
+    return model.replace('.bin', '.mesh')
+
+
+def read(data):
+    # vertices as bytes and indices as an array, indices are 16 bit when the vertices allow it
+    magic, vertex_count, index_count, source = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not an indexed mesh')
+    offset = HEADER.size + vertex_count * VERTEX.itemsize
+    index_type = 'u2' if vertex_count <= 0x10000 else 'u4'
+    return data[HEADER.size:offset], np.frombuffer(data, index_type, index_count, offset)
+
+
+def write(vertices, indices, source):
+    index_type = 'u2' if len(vertices) <= 0x10000 else 'u4'
+    return HEADER.pack(MAGIC, len(vertices), len(indices), source) + vertices.tobytes() + indices.astype(index_type).tobytes()
+
+
+def quantize(vertices):
+    vertices = np.frombuffer(vertices, 'f4').reshape(-1, 9)
+    result = np.zeros(len(vertices), VERTEX)
+    result['position'] = vertices[:, 0:3]
+    result['normal'][:, 0:3] = np.round(np.clip(vertices[:, 3:6], -1.0, 1.0) * 127.0)
+    result['color'][:, 0:3] = np.round(np.clip(vertices[:, 6:9], 0.0, 1.0) * 255.0)
+    result['color'][:, 3] = 255
+    return result
+
+
+def weld(vertices):
+    # corners that quantize to the same bytes become one vertex
+    _, first, indices = np.unique(vertices.view(f'V{VERTEX.itemsize}'), return_index=True, return_inverse=True)
+    return vertices[first], indices.reshape(-1)
+
+
+def cache_misses(indices):
+    # vertex shader invocations with the same cache optimize() orders the triangles for
+    cache = []
+    misses = 0
+    for index in indices.tolist():
+        if index in cache:
+            cache.remove(index)
+        else:
+            misses += 1
+        cache.insert(0, index)
+        del cache[CACHE_SIZE:]
+    return misses
+
+
+def vertex_score(position, valence):
+    # tom forsyth's linear-speed vertex cache optimisation
+    if valence == 0:
+        return -1.0
+    score = 0.0
+    if position >= 0:
+        score = 0.75 if position < 3 else ((CACHE_SIZE - position) / (CACHE_SIZE - 3)) ** 1.5
+    return score + 2.0 * valence ** -0.5
+
+
+def optimize(indices, vertex_count):
+    # reorders triangles for the post-transform cache
+    triangles = indices.reshape(-1, 3).tolist()
+    vertex_triangles = [[] for _ in range(vertex_count)]
+    for i, triangle in enumerate(triangles):
+        for vertex in triangle:
+            vertex_triangles[vertex].append(i)
+    valence = [len(x) for x in vertex_triangles]
+    positions = [-1] * vertex_count
+    scores = [vertex_score(-1, x) for x in valence]
+    triangle_scores = [sum(scores[v] for v in triangle) for triangle in triangles]
+    emitted = [False] * len(triangles)
+    cache = []
+    order = []
+    next_unemitted = 0
+
+    best = max(range(len(triangles)), key=triangle_scores.__getitem__, default=None)
+    while best is not None:
+        emitted[best] = True
+        order.append(best)
+        for vertex in triangles[best]:
+            valence[vertex] -= 1
+            vertex_triangles[vertex].remove(best)
+            if vertex in cache:
+                cache.remove(vertex)
+            cache.insert(0, vertex)
+        dropped = cache[CACHE_SIZE:]
+        del cache[CACHE_SIZE:]
+        for vertex in dropped:
+            positions[vertex] = -1
+
+        # only triangles around the cached and dropped vertices change their score
+        candidates = set()
+        for position, vertex in enumerate(cache + dropped):
+            positions[vertex] = position if position < CACHE_SIZE else -1
+            new_score = vertex_score(positions[vertex], valence[vertex])
+            delta = new_score - scores[vertex]
+            scores[vertex] = new_score
+            for triangle in vertex_triangles[vertex]:
+                triangle_scores[triangle] += delta
+                candidates.add(triangle)
+
+        best = max(candidates, key=triangle_scores.__getitem__, default=None)
+        if best is None:
+            while next_unemitted < len(triangles) and emitted[next_unemitted]:
+                next_unemitted += 1
+            best = next_unemitted if next_unemitted < len(triangles) else None
+
+    return indices.reshape(-1, 3)[order].reshape(-1)
+
+
+def first_use(indices, vertex_count):
+    # vertices in the order the triangles reach them, for fetch locality
+    remap = np.full(vertex_count, -1)
+    first_use = indices[np.sort(np.unique(indices, return_index=True)[1])]
+    remap[first_use] = np.arange(len(first_use))
+    return remap[indices], first_use
+
+
+def convert(source):
+    digest = hashlib.sha1(source).digest()
+    vertices, indices = weld(quantize(source))
+    welded_misses = cache_misses(indices)
+    # the greedy order does not always beat the source order, meshes built as regular grids are close to ideal already
+    optimized = optimize(indices, len(vertices))
+    if cache_misses(optimized) < welded_misses:
+        indices = optimized
+    indices, order = first_use(indices, len(vertices))
+    vertices = vertices[order]
+    data = write(vertices, indices, digest)
+    stats = {
+        'triangles': len(indices) // 3,
+        'vertices': len(vertices),
+        'source_bytes': len(source),
+        'bytes': len(data) - HEADER.size,
+        'invocations': [len(indices), welded_misses, cache_misses(indices)],
+    }
+    return data, stats
+
+
+def current(model, source):
+    try:
+        with open(mesh_path(model), 'rb') as f:
+            magic, _, _, digest = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return False
+    return magic == MAGIC and digest == hashlib.sha1(source).digest()
+
+
+def update(models=None, force=False):
+    # the .mesh files are build outputs and not in the repository, this converts the missing and outdated ones
+    # run after lod.update() so the levels are converted too, without the loose source meshes nothing is converted
+    built = {}
+    for model in models or sorted(glob.glob('assets/*.bin')):
+        if not os.path.exists(model):
+            continue
+        with open(model, 'rb') as f:
+            source = f.read()
+        if not force and current(model, source):
+            continue
+        data, built[model] = convert(source)
+        with open(mesh_path(model), 'wb') as f:
+            f.write(data)
+        report(model, built[model])
+    return built
+
+
+def report(model, stats):
+    soup, welded, optimized = stats['invocations']
+    print(
+        f'{model}: {stats["source_bytes"]} -> {stats["bytes"]} bytes, {stats["vertices"]} vertices, '
+        f'vertex shader runs with a {CACHE_SIZE} entry lru cache {soup} -> {welded} welded -> {optimized} optimized '
+        f'(acmr {optimized / stats["triangles"]:.2f})'
+    )
+
+
+if __name__ == '__main__':
+    built = update(sys.argv[1:], force=True)
+    total = [sum(x['source_bytes'] for x in built.values()), sum(x['bytes'] for x in built.values())]
+    print(f'total: {total[0]} -> {total[1]} bytes')
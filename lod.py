@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+# the share of the source triangles each level keeps, level 0 is the source mesh
+LEVELS = (1.0, 0.5, 0.25, 0.1)
+# the cell size every level was clustered with, the runtime turns it into an error in pixels
+# stored with a hash of the source mesh, levels built from an older version of it are built again
+INDEX = 'assets/lod.json'
+MODELS = ['assets/sand.bin', 'assets/sign.bin', 'assets/fish.bin', 'assets/shotgun.bin']
+
+
+def level_path(model, level):
+    return model if level == 0 else model.replace('.bin', f'.lod{level}.bin')
+
+
+def mean_by(keys, values, count):
+    totals = np.zeros((count, values.shape[1]))
+    np.add.at(totals, keys, values)
+    return totals / np.bincount(keys, minlength=count)[:, None]
+
+
+def decimate(vertices, cell):
+    # vertex clustering, every vertex moves to the average position of its grid cell
+    # normals and colors average per cell and normal direction so hard edges stay hard
+    # triangles that end up with two corners in the same cell are dropped
+    vertices = np.frombuffer(vertices, 'f4').reshape(-1, 9).astype('f8')
+    positions, normals, colors = vertices[:, 0:3], vertices[:, 3:6], vertices[:, 6:9]
+
+    _, cells = np.unique(np.floor((positions - positions.min(axis=0)) / cell).astype('i8'), axis=0, return_inverse=True)
+    cells = cells.reshape(-1)
+    cell_count = cells.max() + 1
+    directions = np.round(normals * 2.0).astype('i8') + 2
+    _, groups = np.unique(cells * 125 + directions[:, 0] * 25 + directions[:, 1] * 5 + directions[:, 2], return_inverse=True)
+    groups = groups.reshape(-1)
+    group_count = groups.max() + 1
+
+    cell_positions = mean_by(cells, positions, cell_count)
+    group_normals = mean_by(groups, normals, group_count)
+    group_normals /= np.maximum(np.linalg.norm(group_normals, axis=1, keepdims=True), 1e-9)
+    group_colors = mean_by(groups, colors, group_count)
+
+    triangles = cells.reshape(-1, 3)
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 2] != triangles[:, 0])
+
+    # clustering folds neighbouring triangles onto each other, one copy of each with the same winding is enough
+    shift = triangles.argmin(axis=1)[:, None]
+    rolled = np.take_along_axis(triangles, (np.arange(3) + shift) % 3, axis=1)
+    _, unique = np.unique(rolled[keep], axis=0, return_index=True)
+    kept = np.flatnonzero(keep)[np.sort(unique)]
+
+    corners = (kept[:, None] * 3 + np.arange(3)).reshape(-1)
+    result = np.concatenate([cell_positions[cells[corners]], group_normals[groups[corners]], group_colors[groups[corners]]], axis=1)
+    return result.astype('f4').tobytes()
+
+
+def build(model):
+    with open(model, 'rb') as f:
+        vertices = f.read()
+    triangles = len(vertices) // 108
+    positions = np.frombuffer(vertices, 'f4').reshape(-1, 9)[:, 0:3]
+    diagonal = float(np.linalg.norm(positions.max(axis=0) - positions.min(axis=0)))
+    print(f'{model}: {triangles} triangles, {len(vertices)} bytes')
+
+    cells = [0.0]
+    for level in range(1, len(LEVELS)):
+        # the triangle count falls as the cells grow, bisect for the largest cell that still keeps the share
+        target = triangles * LEVELS[level]
+        lower, upper = 0.0, diagonal
+        for _ in range(24):
+            cell = (lower + upper) / 2.0
+            if len(decimate(vertices, cell)) // 108 >= target:
+                lower = cell
+            else:
+                upper = cell
+        data = decimate(vertices, lower)
+        with open(level_path(model, level), 'wb') as f:
+            f.write(data)
+        cells.append(lower)
+        print(f'  level {level}: {len(data) // 108} triangles, {len(data)} bytes, cells of {lower:.4f}')
+    return cells
+
+
+def digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_index():
+    try:
+        with open(INDEX) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def current(index, model):
+    entry = index.get(model)
+    if not entry or entry['source'] != digest(model):
+        return False
+    return all(os.path.exists(level_path(model, level)) for level in range(1, len(LEVELS)))
+
+
+def update(models=MODELS, force=False):
+    # the levels are build outputs and not in the repository, this builds the missing and outdated ones
+    # without the loose source meshes the game runs from a bundle that already has them
+    index = load_index()
+    built = [model for model in models if os.path.exists(model) and (force or not current(index, model))]
+    for model in built:
+        index[model] = {'source': digest(model), 'cells': build(model)}
+    if built:
+        with open(INDEX, 'w') as f:
+            json.dump(index, f, indent=4)
+    return built
+
+
+if __name__ == '__main__':
+    update(sys.argv[1:] or MODELS, force=True)
@@ -1,19 +1,33 @@
-import random
 import math
 import os
 import struct
 import sys
+import time
 
+started = time.perf_counter()
+
+import numpy as np
 import pygame
 import zengl
 
 import vmath
+import bundle
+import shaders
 import sounds
-from mesh import make_mesh
+import hits
+import lod
+from mesh import make_mesh, make_mesh_pipeline, make_instanced_levels, load_models, select_level, bounds, levels
 from shade import make_shade
-from water import make_water
+from water import Water, TIERS
 from particles import Particles
 from smoke import Smoke
+from effects import Effects
+from camera import Camera
+from clock import Clock
+from profiler import Profiler, Overlay
+from recorder import Recorder, Replay
+from resolution import DynamicResolution, FrameTimer
+from commands import Commands
 
 def step(x, a, b):
     return (min(max(x, a), b) - a) / (b - a)
@@ -26,54 +40,162 @@ def smootherstep(x, a, b):
     x = step(x, a, b)
     return x * x * x * (x * (x * 6 - 15) + 10)
 
+def option(name, default):
+    return type(default)(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
 os.environ['SDL_WINDOWS_DPI_AWARENESS'] = 'permonitorv2'
 
+# imported by the benchmark on a headless context, the window only exists when running the game
+windowed = __name__ == '__main__'
+size = tuple(int(x) for x in option('--size', '1280x720').split('x'))
+
 pygame.init()
-pygame.display.set_mode((1280, 720), flags=pygame.OPENGL | pygame.DOUBLEBUF, vsync=True)
-pygame.display.set_caption('Fishing')
+if windowed:
+    pygame.display.set_mode(size, flags=pygame.OPENGL | pygame.DOUBLEBUF, vsync=True)
+    pygame.display.set_caption('Fishing')
+    size = pygame.display.get_window_size()
+
+if windowed:
+    # the benchmark installs its own loader before importing the game
+    zengl.init(shaders.ProgramCache(zengl.loader()))
 
 ctx = zengl.context()
 
-size = pygame.display.get_window_size()
 image = ctx.image(size, 'rgba8unorm')
 depth = ctx.image(size, 'depth24plus')
 
-uniform_buffer = ctx.buffer(size=96, uniform=True)
-
-water = make_water(uniform_buffer, depth, [image])
-sand = make_mesh(uniform_buffer, 'assets/sand.bin', [image, depth])
-start = make_mesh(uniform_buffer, 'assets/start.bin', [image, depth], blending=True)
-sign = make_mesh(uniform_buffer, 'assets/sign.bin', [image, depth])
-fish = make_mesh(uniform_buffer, 'assets/fish.bin', [image, depth])
-shotgun = make_mesh(uniform_buffer, 'assets/shotgun.bin', [image, depth])
+uniform_buffer = ctx.buffer(size=112, uniform=True)
+
+# with --lod the meshes carry the levels lod.py built and each draw picks one by its size on screen
+lods = '--lod' in sys.argv
+lod_error = option('--lod-error', 2.0)
+# with --indexed the meshes load the welded and quantized versions indexed_mesh.py writes
+indexed = '--indexed' in sys.argv
+
+water = Water(uniform_buffer, depth, [image], option('--water', 'high'))
+# the meshes that never move share one buffer, the opaque ones one pipeline
+# sand and sign drawn in the same frame merge into a single draw, start keeps its own blended pipeline for the fade
+static = load_models(['assets/sand.bin', 'assets/sign.bin', 'assets/start.bin'], lods=lods, indexed=indexed)
+scenery = make_mesh_pipeline(uniform_buffer, static, [image, depth], levels['assets/sand.bin'][0])
+start = make_mesh_pipeline(uniform_buffer, static, [image, depth], levels['assets/start.bin'][0], blending=True)
+fish_count = option('--fish', 10)
+fish_stride = zengl.calcsize('3f 4f')
+fish_instances = ctx.buffer(size=fish_stride * fish_count * (len(lod.LEVELS) if lods else 1))
+fish_levels = make_instanced_levels(uniform_buffer, 'assets/fish.bin', [image, depth], fish_instances, fish_count, lods=lods, indexed=indexed)
+shotgun = make_mesh(uniform_buffer, 'assets/shotgun.bin', [image, depth], lods=lods, indexed=indexed)
 
 shade = make_shade([image])
 
-particles = Particles(uniform_buffer, 'assets/particle.bin', [image, depth])
-smoke = Smoke(uniform_buffer, 'assets/particle.bin', [image, depth])
+gpu_particles = '--gpu-particles' in sys.argv
+effects = Effects(uniform_buffer, 'assets/particle.bin', [image, depth], max_capacity=200000, gpu=gpu_particles, indexed=indexed)
+# gpu emitters allocate from the effects ring, cpu emitters keep their own packed streams
+shared_stream = effects.stream if gpu_particles else None
+particles = effects.register(Particles(max_capacity=100000, gpu=gpu_particles, stream=shared_stream))
+smoke = effects.register(Smoke(max_capacity=100000, gpu=gpu_particles, stream=shared_stream))
 
 eye = (6.4, 0.0, 3.5)
 light = (3.0, 4.0, 30.0)
 
+camera = Camera(eye, aspect=size[0] / size[1])
+clock = Clock(option('--sim-rate', 60.0))
+commands = Commands()
+culling = '--no-culling' not in sys.argv
+
+# the scene renders into the lower left corner of the full size targets and the present blit scales it to the window
+# the camera aspect and the mouse mapping stay in window terms, only the pixel count changes
+render_size = size
+resolution = None
+if '--dynamic-resolution' in sys.argv:
+    resolution = DynamicResolution(budget=option('--frame-budget', 1000.0 / 60.0) / 1000.0)
+    frame_timer = FrameTimer()
+
 def load_texture(name):
-    img = pygame.image.load(name)
-    pixels = pygame.image.tobytes(img, 'RGBA', True)
-    return ctx.image(img.get_size(), 'rgba8unorm', pixels)
+    size, pixels = bundle.image(name)
+    return ctx.image(size, 'rgba8unorm', pixels)
 
 def update_camera(target, fov):
-    aspect = size[0] / size[1]
-    camera = zengl.camera(eye, target, aspect=aspect, fov=fov)
-    uniform_buffer.write(struct.pack('64s3f4x3f4x', camera, *eye, *light))
-
-def render_model(model, position, rotation):
-    model.uniforms['Position'][:] = struct.pack('3f', *position)
-    model.uniforms['Rotation'][:] = struct.pack('4f', *rotation)
-    model.render()
+    if camera.look(target, fov):
+        commands.write(uniform_buffer, struct.pack('64s3f4x3f4x', camera.matrix, *eye, *light))
+
+def update_time(now):
+    commands.write(uniform_buffer, struct.pack('f', now), offset=96)
+
+def in_view(model_bounds, center=None):
+    # the sphere test is cheap and rejects most, the box is tighter for the static meshes
+    if not culling:
+        return True
+    if center is not None:
+        return camera.spheres_visible([center], model_bounds.radius)[0]
+    return camera.spheres_visible([model_bounds.center], model_bounds.radius)[0] and camera.box_visible(model_bounds.lower, model_bounds.upper)
+
+def pixels_per_unit():
+    # on screen pixels of one world unit at distance one
+    return render_size[1] / (2.0 * math.tan(math.radians(camera.fov) / 2.0))
+
+def vertex_range(name, distance):
+    first, count, error = levels[name][int(select_level(name, distance, pixels_per_unit(), lod_error))]
+    return first, count
+
+def render_static(model, name, uniforms=None, blended=False):
+    model_bounds = bounds[name]
+    if not in_view(model_bounds):
+        commands.cull('static', 0, 1)
+        return
+    commands.cull('static', 1, 0)
+    # the nearest point of the box decides the level, the static meshes stretch towards the camera
+    nearest = np.linalg.norm(np.maximum(np.maximum(model_bounds.lower - camera.eye, camera.eye - model_bounds.upper), 0.0))
+    depth = None if blended else math.dist(camera.eye, model_bounds.center)
+    commands.draw(model, uniforms, depth=depth, vertices=vertex_range(name, nearest))
+
+def render_model(model, name, position, rotation):
+    model_bounds = bounds[name]
+    center = vmath.add(position, vmath.qtransform(rotation, model_bounds.center))
+    if not in_view(model_bounds, center):
+        commands.cull('static', 0, 1)
+        return
+    commands.cull('static', 1, 0)
+    uniforms = {
+        'Position': struct.pack('3f', *position),
+        'Rotation': struct.pack('4f', *rotation),
+    }
+    distance = math.dist(camera.eye, center)
+    commands.draw(model, uniforms, depth=distance, vertices=vertex_range(name, max(distance - model_bounds.radius, 0.0)))
+
+def render_instanced(model, instance_buffer, data, count, depth, offset=0):
+    if count:
+        commands.write(instance_buffer, data, offset)
+    commands.draw(model, depth=depth, instances=count)
+
+def render_start(alpha):
+    render_static(start, 'assets/start.bin', {'Alpha': struct.pack('f', alpha)}, blended=True)
+
+def render_effects(alpha):
+    effects.render(alpha, camera.spheres_visible if culling else None)
+    commands.cull('particles', effects.drawn, effects.culled)
+
+def render_shade(alpha):
+    commands.draw(shade, {'Color': struct.pack('4f', 0.0, 0.0, 0.0, alpha)})
+
+def blit_texture(texture):
+    # shrinks with the render size so the present blit brings it back to its own size on screen
+    w, h = render_size
+    tw, th = round(600 * w / size[0]), round(400 * h / size[1])
+    texture.blit(image, ((w - tw) // 2, (h - th) // 2), (tw, th))
+
+def set_render_viewport(viewport):
+    global render_size
+    render_size = viewport[2:]
+    for pipeline in (scenery, start, *fish_levels, shotgun, shade):
+        pipeline.viewport = viewport
+    effects.set_viewport(viewport)
+    water.set_viewport(viewport)
 
 def render_water():
-    water.uniforms['Time'][:] = struct.pack('f', g.now)
-    water.uniforms['WaterLevel'][:] = struct.pack('f', 1.0 + math.sin(g.now) * 0.5)
-    water.render()
+    uniforms = {
+        'Time': struct.pack('f', g.now),
+        'WaterLevel': struct.pack('f', 1.0 + math.sin(g.now) * 0.5),
+    }
+    commands.draw(water, uniforms)
 
 
 press_any_key = load_texture('assets/press-any-key.png')
@@ -98,41 +220,69 @@ wave = WaveSound()
 
 
 class Fishes:
-    def __init__(self):
-        self.fishes = [
-            (vmath.rand(-0.5, 0.5), vmath.rand(-0.5, 0.5), vmath.rand(-0.5, 0.5), vmath.rand(-0.5, 0.5))
-            for _ in range(10)
-        ]
-        self.visible_fishes = [False] * 10
-        self.rotations = [vmath.random_quaternion() for _ in range(10)]
-        self.delta_rotations = [
-            vmath.axis_angle(vmath.qtransform(vmath.random_quaternion(), (1.0, 0.0, 0.0)), 0.05)
-            for _ in range(10)
-        ]
-
-    def render(self):
-        self.rotations = [vmath.quatmul(self.delta_rotations[i], self.rotations[i]) for i in range(10)]
-        for i in range(10):
-            x, y, z, w = self.fishes[i]
-            z += math.sin(g.now * 1.0 + w * 6.0) * 6.0
-            if not self.visible_fishes[i]:
-                if math.sin(g.now * 1.0 + w * 6.0) < -0.8:
-                    self.visible_fishes[i] = True
-            x, y, z = x * 10.0 - 16.0, y + (i - 4.5) * 3.0, z
-            if self.visible_fishes[i]:
-                render_model(fish, (x, y, z), self.rotations[i])
-
-    def render_ending(self):
-        self.rotations = [vmath.quatmul(self.delta_rotations[i], self.rotations[i]) for i in range(10)]
-        for i in range(10):
-            x, y, z, w = self.fishes[i]
-            z += math.sin(g.now * 1.0 + w * 6.0) * 6.0
-            if self.visible_fishes[i]:
-                if math.sin(g.now * 1.0 + w * 6.0) < -0.8:
-                    self.visible_fishes[i] = False
-            x, y, z = x * 10.0 - 16.0, y + (i - 4.5) * 3.0, z
-            if self.visible_fishes[i]:
-                render_model(fish, (x, y, z), self.rotations[i])
+    def __init__(self, count=10, now=0.0):
+        self.count = count
+        self.fishes = vmath.generator.uniform(-0.5, 0.5, (count, 4))
+        self.visible_fishes = np.zeros(count, bool)
+        self.rotations = vmath.random_quaternions(count)
+        # the spin is 0.05 radians per step of the original 60 fps loop
+        spin = 0.05 * clock.dt * 60.0
+        self.delta_rotations = vmath.axis_angle_array(vmath.qtransform_array(vmath.random_quaternions(count), (1.0, 0.0, 0.0)), spin)
+        # the lanes span the same stretch of water for any school size
+        self.lanes = (np.arange(count) - (count - 1) / 2.0) * (30.0 / count)
+        # world positions and rotations in the fish instance layout, shared by rendering and hit testing
+        self.instances = np.zeros((count, 7), 'f4')
+        self.positions = self.instances[:, 0:3]
+        self.place(now)
+        self.previous = self.instances.copy()
+        self.grid = hits.LaneGrid(self.lanes, 0.5, (-21.0, -11.0))
+
+    def place(self, now, i=slice(None)):
+        x, y, z, w = self.fishes[i].T
+        wave = np.sin(now * 1.0 + w * 6.0)
+        self.positions[i, 0] = x * 10.0 - 16.0
+        self.positions[i, 1] = y + self.lanes[i]
+        self.positions[i, 2] = z + wave * 6.0
+        self.instances[i, 3:7] = self.rotations[i]
+        return wave
+
+    def step(self, now, ending=False):
+        self.previous[:] = self.instances
+        self.rotations = vmath.quatmul_array(self.delta_rotations, self.rotations)
+        wave = self.place(now)
+        if ending:
+            self.visible_fishes &= wave >= -0.8
+        else:
+            self.visible_fishes |= wave < -0.8
+
+    def respawn(self, i, now):
+        x, y, z = vmath.rand(-0.5, 0.5), vmath.rand(-0.5, 0.5), vmath.rand(-0.5, 0.5)
+        w = vmath.rand(-0.1, 0.1) - (now * 1.0 + math.pi / 2.0) / 6.0
+        self.fishes[i] = x, y, z, w
+        self.rotations[i] = vmath.random_quaternion()
+        # respawned fish jump to their new place instead of blending there
+        self.place(now, i)
+        self.previous[i] = self.instances[i]
+
+    def render(self, alpha=1.0):
+        data = self.previous[self.visible_fishes]
+        data += (self.instances[self.visible_fishes] - data) * alpha
+        data[:, 3:7] /= np.linalg.norm(data[:, 3:7], axis=1, keepdims=True)
+        if culling:
+            # the fish turn around their origin, the extent covers every rotation
+            mask = camera.spheres_visible(data[:, 0:3], bounds['assets/fish.bin'].extent)
+            commands.cull('fish', np.count_nonzero(mask), np.count_nonzero(~mask))
+            data = data[mask]
+        else:
+            commands.cull('fish', len(data), 0)
+        # each level draws its fish from its own block of the instance buffer
+        distances = np.linalg.norm(data[:, 0:3] - camera.eye, axis=1)
+        depth = distances.min() if len(data) else 0.0
+        level = select_level('assets/fish.bin', distances - bounds['assets/fish.bin'].extent, pixels_per_unit(), lod_error)
+        for i, pipeline in enumerate(fish_levels):
+            part = data[level == i]
+            if len(part):
+                render_instanced(pipeline, fish_instances, part, len(part), depth, i * fish_count * fish_stride)
 
 
 class SceneFadeOutLoose:
@@ -148,20 +298,21 @@ class SceneFadeOutLoose:
         camera_target = (5.68, 0.0, 2.9 + 0.55)
         update_camera(camera_target, fov=50.0)
 
-        sand.render()
-        self.fishes.render_ending()
+        for now in clock.advance(g.now):
+            self.fishes.step(now, ending=True)
+
+        render_static(scenery, 'assets/sand.bin')
+        self.fishes.render(clock.alpha)
         render_water()
 
-        shade.uniforms['Color'][:] = struct.pack('4f', 0.0, 0.0, 0.0, shade_alpha)
-        shade.render()
+        render_shade(shade_alpha)
 
         if elapsed > 3.0:
-            w, h = image.size
-            game_over.blit(image, ((w - 600) // 2, (h - 400) // 2))
+            commands.call(blit_texture, game_over)
 
         if elapsed > 4.0:
             if len(g.keys) > 0:
-                g.first_tick = pygame.time.get_ticks()
+                g.first_tick = g.ticks
                 g.now = 0.0
                 g.scene = SceneFadeIn()
 
@@ -179,20 +330,21 @@ class SceneFadeOutWin:
         camera_target = (5.68, 0.0, 2.9 + 0.55)
         update_camera(camera_target, fov=50.0)
 
-        sand.render()
-        self.fishes.render_ending()
+        for now in clock.advance(g.now):
+            self.fishes.step(now, ending=True)
+
+        render_static(scenery, 'assets/sand.bin')
+        self.fishes.render(clock.alpha)
         render_water()
 
-        shade.uniforms['Color'][:] = struct.pack('4f', 0.0, 0.0, 0.0, shade_alpha)
-        shade.render()
+        render_shade(shade_alpha)
 
         if elapsed > 3.0:
-            w, h = image.size
-            you_win.blit(image, ((w - 600) // 2, (h - 400) // 2))
+            commands.call(blit_texture, you_win)
 
         if elapsed > 4.0:
             if len(g.keys) > 0:
-                g.first_tick = pygame.time.get_ticks()
+                g.first_tick = g.ticks
                 g.now = 0.0
                 g.scene = SceneFadeIn()
 
@@ -200,30 +352,32 @@ class SceneFadeOutWin:
 class ScenePlay:
     def __init__(self):
         pygame.mixer.music.play()
-        self.fishes = Fishes()
+        clock.reset(g.now)
+        effects.clear()
+        self.fishes = Fishes(fish_count, g.now)
         self.start = g.now
         self.shot = False
         self.hits = 0
 
     def render(self):
         elapsed = g.now - self.start
-        mouse = pygame.mouse.get_pos()
+        mouse = g.mouse
         mx = mouse[0] / size[0] * 2.0 - 1.0
         my = 1.0 - mouse[1] / size[1] * 2.0
         camera_target = (5.68, 0.0, 2.9 + 0.55)
         gun_position = (5.96, 0.38, 3.25)
         gun_rotation = vmath.quatmul(vmath.rz(-mx * 0.65), vmath.ry(my * 0.5))
         update_camera(camera_target, fov=50.0)
-        sand.render()
-        render_model(shotgun, gun_position, gun_rotation)
-        if self.hits > 99:
-            self.fishes.render_ending()
-        else:
-            self.fishes.render()
-        particles.update()
-        smoke.update()
-        particles.render()
-        smoke.render()
+
+        # the simulation ticks at the clock rate, a frame may run several steps or none
+        for now in clock.advance(g.now):
+            self.simulate(now, mx, my, gun_position, gun_rotation)
+
+        update_time(clock.render_time)
+        render_static(scenery, 'assets/sand.bin')
+        render_model(shotgun, 'assets/shotgun.bin', gun_position, gun_rotation)
+        self.fishes.render(clock.alpha)
+        commands.call(render_effects, clock.alpha)
         render_water()
 
         if elapsed > 60.0 or (self.hits >= 100 and not any(self.fishes.visible_fishes)):
@@ -232,41 +386,26 @@ class ScenePlay:
             else:
                 g.scene = SceneFadeOutLoose(self.fishes)
 
+    def simulate(self, now, mx, my, gun_position, gun_rotation):
+        self.fishes.step(now, ending=self.hits > 99)
+        effects.update(now, clock.dt)
+
         if 'mouse1' in g.keys and not self.shot:
             self.shot = True
             sounds.shooting.play()
-            aspect = size[0] / size[1]
-            a, b = vmath.unproject(eye, camera_target, aspect=aspect, fov=50.0, x=mx, y=my)
+            a, b = camera.unproject(mx, my)
             x, y, z = gun_position
             smoke_position = list(vmath.add(gun_position, vmath.qtransform(gun_rotation, (-0.5, 0.0, 0.05))))
             smoke_direction = vmath.qtransform(gun_rotation, (-0.2, 0.0, 0.0))
 
-            for _ in range(30):
-                velocity = list(vmath.qtransform(vmath.random_quaternion(), (vmath.rand(0.02, 0.023), 0.0, 0.0)))
-                velocity = vmath.add(velocity, smoke_direction)
-                smoke.add(smoke_position, velocity, vmath.random_quaternion(), vmath.rand(0.1, 0.2), (0.5, 0.5, 0.5), random.randint(10, 14))
-
-            hit = False
-            for i in range(10):
-                if not self.fishes.visible_fishes[i]:
-                    continue
-                x, y, z, w = self.fishes.fishes[i]
-                z += math.sin(g.now * 1.0 + w * 6.0) * 6.0
-                x, y, z = x * 10.0 - 16.0, y + (i - 4.5) * 3.0, z
-                if vmath.point_line_distance((x, y, z), a, b) < 2.0:
-                    hit = True
-                    for _ in range(100):
-                        rotation = vmath.random_quaternion()
-                        scale = vmath.rand(0.5, 1.0)
-                        velocity = list(vmath.qtransform(vmath.random_quaternion(), (vmath.rand(0.03, 0.12), 0.0, 0.0)))
-                        velocity[2] += 0.1
-                        particles.add([x, y, z], velocity, rotation, scale, (0.8, 0.0, 0.0))
-                    x, y, z = vmath.rand(-0.5, 0.5), vmath.rand(-0.5, 0.5), vmath.rand(-0.5, 0.5)
-                    w = vmath.rand(-0.1, 0.1) - (g.now * 1.0 + math.pi / 2.0) / 6.0
-                    self.fishes.fishes[i] = x, y, z, w
-                    self.fishes.rotations[i] = vmath.random_quaternion()
-
-            if hit:
+            smoke.emit_burst(smoke_position, 30, (0.02, 0.023), (0.1, 0.2), (0.5, 0.5, 0.5), drift=smoke_direction, lifetime_range=(10, 14))
+
+            _, hit_fishes = hits.ray_hits(self.fishes.positions, 2.0, a, b, self.fishes.visible_fishes, self.fishes.grid)
+            for i in np.unique(hit_fishes):
+                particles.emit_burst(self.fishes.positions[i], 100, (0.03, 0.12), (0.5, 1.0), (0.8, 0.0, 0.0), drift=(0.0, 0.0, 0.1))
+                self.fishes.respawn(i, now)
+
+            if len(hit_fishes):
                 self.hits += 1
                 if self.hits == 1:
                     sounds.fishing.play()
@@ -330,12 +469,11 @@ class SceneIntro:
         start_alpha = 0.8 - smoothstep(elapsed, 0.0, 0.3) * 0.8
 
         update_camera((5.68, -y, 2.9 + z), fov=fov)
-        sand.render()
+        render_static(scenery, 'assets/sand.bin')
 
-        start.uniforms['Alpha'][:] = struct.pack('f', start_alpha)
-        start.render()
+        render_start(start_alpha)
 
-        sign.render()
+        render_static(scenery, 'assets/sign.bin')
 
         render_water()
 
@@ -354,7 +492,7 @@ class SceneFadeIn:
         shade_alpha = 1.0 - smoothstep(elapsed, 0.0, 1.0)
         start_alpha = smoothstep(elapsed, 7.1, 7.6)
 
-        mouse = pygame.mouse.get_pos()
+        mouse = g.mouse
         mx = mouse[0] / size[0] * 2.0 - 1.0
         my = 1.0 - mouse[1] / size[1] * 2.0
 
@@ -364,15 +502,13 @@ class SceneFadeIn:
             start_alpha = 0.8
 
         update_camera((5.68, 0.0, 2.9), fov=45.0)
-        sand.render()
+        render_static(scenery, 'assets/sand.bin')
 
-        start.uniforms['Alpha'][:] = struct.pack('f', start_alpha)
-        start.render()
+        render_start(start_alpha)
 
         render_water()
 
-        shade.uniforms['Color'][:] = struct.pack('4f', 0.0, 0.0, 0.0, shade_alpha)
-        shade.render()
+        render_shade(shade_alpha)
 
         if hovering_start and 'mouse1' in g.keys:
             pygame.mixer.music.stop()
@@ -382,11 +518,10 @@ class SceneFadeIn:
 
 class ScenePressAnyKey:
     def render(self):
-        w, h = image.size
-        press_any_key.blit(image, ((w - 600) // 2, (h - 400) // 2))
+        commands.call(blit_texture, press_any_key)
 
         if len(g.keys) > 0:
-            g.first_tick = pygame.time.get_ticks()
+            g.first_tick = g.ticks
             g.now = 0.0
             g.scene = SceneFadeIn()
 
@@ -394,43 +529,202 @@ class ScenePressAnyKey:
 class g:
     scene = ScenePressAnyKey()
     first_tick = 0
+    ticks = 0
     now = 0.0
     keys = set()
+    mouse = (0, 0)
+
 
+# the profiler replaces the timed objects with stand-ins, without --profile nothing is wrapped
+profiler = None
 
-# g.first_tick = pygame.time.get_ticks()
+if '--profile' in sys.argv:
+    profiler = Profiler()
+    overlay = Overlay(ctx, profiler)
+    scenery = profiler.instrument(scenery, render='scenery')
+    start = profiler.instrument(start, render='start')
+    shotgun = profiler.instrument(shotgun, render='shotgun')
+    fish_levels = [profiler.instrument(x, render='fish') for x in fish_levels]
+    water = profiler.instrument(water, render='water')
+    shade = profiler.instrument(shade, render='shade')
+    effects = profiler.instrument(effects, update='effects.update', render='effects')
+    press_any_key = profiler.instrument(press_any_key, blit='blit')
+    game_over = profiler.instrument(game_over, blit='blit')
+    you_win = profiler.instrument(you_win, blit='blit')
+    Fishes.step = profiler.timed('fish.step', Fishes.step)
+
+
+# g.first_tick = g.ticks
 # g.scene = SceneIntro()
 # g.scene = ScenePlay()
 
 
-while True:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            # sys.exit()
-            os._exit(0)
+def handle_event(event):
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        g.keys.add(f'mouse{event.button}')
 
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            g.keys.add(f'mouse{event.button}')
+    if event.type == pygame.MOUSEBUTTONUP:
+        g.keys.discard(f'mouse{event.button}')
 
-        if event.type == pygame.MOUSEBUTTONUP:
-            g.keys.discard(f'mouse{event.button}')
+    if event.type == pygame.KEYDOWN:
+        g.keys.add(event.key)
+        if event.key == pygame.K_F3 and profiler:
+            overlay.visible = not overlay.visible
+        if event.key == pygame.K_F4:
+            tiers = list(TIERS)
+            water.configure(tiers[(tiers.index(water.tier) + 1) % len(tiers)])
 
-        if event.type == pygame.KEYDOWN:
-            g.keys.add(event.key)
+    if event.type == pygame.KEYUP:
+        g.keys.discard(event.key)
 
-        if event.type == pygame.KEYUP:
-            g.keys.discard(event.key)
 
-    g.now = (pygame.time.get_ticks() - g.first_tick) / 1000.0
+def render_frame():
+    if profiler:
+        profiler.begin_frame()
 
     ctx.new_frame()
+    if resolution:
+        frame_timer.begin()
     image.clear()
     depth.clear()
 
     g.scene.render()
+    commands.submit()
+
+    if render_size == size:
+        if profiler:
+            overlay.render(image)
+        image.blit()
+    else:
+        image.blit(None, size=size, crop=(0, 0, *render_size), filter=True)
+        if profiler:
+            overlay.render(None, size)
+
+    if resolution and resolution.update(frame_timer.end()):
+        set_render_viewport(resolution.viewport(size))
+    ctx.end_frame()
 
-    image.blit()
+    if profiler:
+        profiler.end_frame()
+
+
+def warm_up():
+    # every pipeline, blend state and blit is drawn once before the first frame, the pipelines into an empty viewport
+    # the driver finishes its first-use work here instead of stuttering when a scene starts
+    # water warms each tier as it builds it, here every tier F4 cycles through gets built
+    # effects warms the pipeline it rebuilds when its buffer grows
+    def blit_pixel(texture, target):
+        texture.blit(target, (0, 0), (1, 1), (0, 0, 1, 1))
+
+    current_tier = water.tier
+    passes = [
+        ('scenery', lambda: shaders.warm(scenery)),
+        ('start', lambda: shaders.warm(start)),
+        ('shotgun', lambda: shaders.warm(shotgun)),
+        ('fish', lambda: [shaders.warm(x, fish_count) for x in fish_levels]),
+        *[(f'water_{tier}', lambda tier=tier: water.configure(tier)) for tier in TIERS],
+        ('shade', lambda: shaders.warm(shade)),
+        ('press_any_key', lambda: blit_pixel(press_any_key, image)),
+        ('game_over', lambda: blit_pixel(game_over, image)),
+        ('you_win', lambda: blit_pixel(you_win, image)),
+    ]
+
+    timings = {}
+    ctx.new_frame()
+    for name, render in passes:
+        start_time = time.perf_counter()
+        render()
+        # reading a pixel waits until the driver has done the work
+        image.read((1, 1))
+        timings[name] = (time.perf_counter() - start_time) * 1000.0
+    water.configure(current_tier)
+    image.clear()
+    depth.clear()
+    # the present blit copies one pixel of the cleared target, nothing of the warm-up reaches the window
+    start_time = time.perf_counter()
+    blit_pixel(image, None)
+    timings['present'] = (time.perf_counter() - start_time) * 1000.0
     ctx.end_frame()
+    return timings
+
+
+def tick(ticks, mouse, events):
+    for event in events:
+        handle_event(event)
+
+    g.ticks = ticks
+    g.mouse = mouse
+    g.now = (g.ticks - g.first_tick) / 1000.0
+
+    render_frame()
+
+
+def shutdown(recorder=None):
+    if recorder:
+        recorder.close()
+    if profiler:
+        profiler.dump(option('--profile-output', 'profile.json'))
+    pygame.quit()
+    # sys.exit()
+    os._exit(0)
+
+
+def report_startup(first_frame):
+    if first_frame:
+        print(f'first frame after {(time.perf_counter() - started) * 1000.0:.0f} ms, {len(sounds.assets.loaded)} of {len(sounds.SOUNDS)} sounds decoded')
+        print(f'shaders: {shaders.stats}')
+    if sounds.assets.done():
+        print(f'sounds decoded after {max(sounds.assets.loaded.values()) * 1000.0:.0f} ms, {sounds.assets.waited * 1000.0:.0f} ms spent waiting for them')
+        return True
+
+
+def run():
+    recorder = None
+    replay = None
+    first_frame = True
+    loading = True
+
+    timings = warm_up()
+    print(f'warm-up {sum(timings.values()):.0f} ms: ' + ', '.join(f'{name} {ms:.1f}' for name, ms in timings.items()))
+
+    # gameplay only depends on the seed and the per-frame input, recording both makes a session replayable
+    if '--replay' in sys.argv:
+        recording = Replay(option('--replay', ''))
+        if recording.size != size:
+            raise ValueError(f'the recording was made at {recording.size[0]}x{recording.size[1]}, run it with the same --size')
+        vmath.seed(recording.seed)
+        replay = iter(recording)
+    else:
+        seed = option('--seed', int.from_bytes(os.urandom(4), 'little'))
+        vmath.seed(seed)
+        if '--record' in sys.argv:
+            recorder = Recorder(option('--record', ''), seed, size)
+
+    while True:
+        events = pygame.event.get()
+        ticks = pygame.time.get_ticks()
+        mouse = pygame.mouse.get_pos()
+
+        if replay:
+            # closing the window still works, everything else comes from the recording
+            if any(event.type == pygame.QUIT for event in events):
+                shutdown()
+            ticks, mouse, events = next(replay, (0, (0, 0), [pygame.event.Event(pygame.QUIT)]))
+
+        if recorder:
+            recorder.frame(ticks, mouse, events)
+
+        if any(event.type == pygame.QUIT for event in events):
+            shutdown(recorder)
+
+        tick(ticks, mouse, events)
+
+        pygame.display.flip()
+
+        if loading:
+            loading = not report_startup(first_frame)
+            first_frame = False
+
 
-    pygame.display.flip()
+if __name__ == '__main__':
+    run()
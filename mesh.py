@@ -1,9 +1,123 @@
+import functools
+import json
+
+import numpy as np
 import zengl
 
+import bundle
+import indexed_mesh
+import lod
+import shaders
+
+LAYOUT = '3f 3f 3f'
+
+
+class Bounds:
+    def __init__(self, vertices, stride=36):
+        # the position leads every vertex layout
+        positions = np.frombuffer(vertices, 'f4').reshape(-1, stride // 4)[:, 0:3]
+        self.lower = positions.min(axis=0)
+        self.upper = positions.max(axis=0)
+        self.center = (self.lower + self.upper) / 2.0
+        self.radius = float(np.linalg.norm(positions - self.center, axis=1).max())
+        # the radius around the model origin, for instances placed and rotated by it
+        self.extent = float(np.linalg.norm(positions, axis=1).max())
+
+
+# filled in as the models load, keyed by model path
+bounds = {}
+# the vertex range of every detail level as first vertex, vertex count and its error in world units
+# indexed models count indices instead of vertices
+levels = {}
+
+
+class Geometry:
+    def __init__(self, vertex_buffer, layout, index_buffer=None, short_index=False):
+        self.vertex_buffer = vertex_buffer
+        self.layout = layout
+        self.index_buffer = index_buffer
+        self.short_index = short_index
+
+
+@functools.cache
+def lod_index():
+    # the levels are built on first use and again whenever a source mesh changes
+    if lod.update():
+        print(f'built the detail levels into {lod.INDEX}')
+    try:
+        return json.loads(bundle.text(lod.INDEX))
+    except OSError:
+        return {}
+
+
+def load_model(model, lods=False, indexed=False):
+    return load_models([model], lods, indexed)
+
 
-def make_mesh(uniform_buffer, model, framebuffer, blending=False):
+def load_models(models, lods=False, indexed=False):
+    # every model and with lods the levels lod.py built go into the same buffers, the source meshes of all models first
+    # indexed models load what indexed_mesh.py converted, each level's indices are rebased onto the shared vertices
     ctx = zengl.context()
-    vertex_buffer = ctx.buffer(open(model, 'rb').read())
+    layout = indexed_mesh.LAYOUT if indexed else LAYOUT
+    stride = zengl.calcsize(layout)
+    paths = {}
+    for model in models:
+        paths[model] = [(model, 0.0)]
+        if lods and model in lod_index():
+            # clustering moves a vertex by about half a cell
+            paths[model] += [(lod.level_path(model, level), cell * 0.5) for level, cell in enumerate(lod_index()[model]['cells'][1:], 1)]
+        levels[model] = []
+    if indexed:
+        # converted on first use and again whenever a source mesh changes
+        indexed_mesh.update([path for model in models for path, error in paths[model]])
+
+    parts = []
+    indices = []
+    vertex_count = index_count = 0
+    for level in range(max(len(x) for x in paths.values())):
+        for model in models:
+            if level >= len(paths[model]):
+                continue
+            path, error = paths[model][level]
+            if indexed:
+                vertices, index = indexed_mesh.read(bundle.read(indexed_mesh.mesh_path(path)))
+                levels[model].append((index_count, len(index), error))
+                indices.append(index.astype('u4') + vertex_count)
+                index_count += len(index)
+            else:
+                vertices = bundle.read(path)
+                levels[model].append((vertex_count, len(vertices) // stride, error))
+            if level == 0:
+                bounds[model] = Bounds(vertices, stride)
+            parts.append(vertices)
+            vertex_count += len(vertices) // stride
+
+    vertex_buffer = ctx.buffer(parts[0] if len(parts) == 1 else b''.join(parts))
+    if not indexed:
+        return Geometry(vertex_buffer, layout)
+    short_index = vertex_count <= 0x10000
+    index_buffer = ctx.buffer(np.concatenate(indices).astype('u2' if short_index else 'u4'), index=True)
+    return Geometry(vertex_buffer, layout, index_buffer, short_index)
+
+
+def select_level(model, distance, pixels_per_unit, max_error=2.0):
+    # the coarsest level whose error stays under max_error pixels, distance may be an array
+    distance = np.asarray(distance)
+    level = np.zeros(distance.shape, int)
+    for i, (first, count, error) in enumerate(levels[model]):
+        level[error * pixels_per_unit <= max_error * distance] = i
+    return level
+
+
+def make_mesh(uniform_buffer, model, framebuffer, blending=False, lods=False, indexed=False):
+    geometry = load_model(model, lods, indexed)
+    return make_mesh_pipeline(uniform_buffer, geometry, framebuffer, levels[model][0], blending)
+
+
+def make_mesh_pipeline(uniform_buffer, geometry, framebuffer, level, blending=False):
+    # level is the vertex range drawn until a draw asks for another one
+    ctx = zengl.context()
+    first, count, error = level
     blend = None
     if blending:
         blend = {
@@ -12,8 +126,8 @@ def make_mesh(uniform_buffer, model, framebuffer, blending=False):
             'dst_color': 'one_minus_src_alpha',
         }
     return ctx.pipeline(
-        vertex_shader=open('shaders/mesh.vert').read(),
-        fragment_shader=open('shaders/mesh.frag').read(),
+        vertex_shader=shaders.source('shaders/mesh.vert'),
+        fragment_shader=shaders.source('shaders/mesh.frag'),
         layout=[
             {
                 'name': 'Common',
@@ -32,10 +146,65 @@ def make_mesh(uniform_buffer, model, framebuffer, blending=False):
             'Rotation': [0.0, 0.0, 0.0, 0.0],
             'Alpha': 1.0,
         },
+        includes={
+            'mesh_mode': '',
+        },
         blend=blend,
         framebuffer=framebuffer,
         topology='triangles',
         cull_face='back',
-        vertex_buffers=zengl.bind(vertex_buffer, '3f 3f 3f', 0, 1, 2),
-        vertex_count=vertex_buffer.size // zengl.calcsize('3f 3f 3f'),
+        vertex_buffers=zengl.bind(geometry.vertex_buffer, geometry.layout, 0, 1, 2),
+        index_buffer=geometry.index_buffer,
+        short_index=geometry.short_index,
+        first_vertex=first,
+        vertex_count=count,
+    )
+
+
+def make_instanced_levels(uniform_buffer, model, framebuffer, instance_buffer, capacity, lods=False, indexed=False):
+    # a pipeline per level, level i reads its instances from the i-th block of capacity instances
+    geometry = load_model(model, lods, indexed)
+    stride = zengl.calcsize('3f 4f')
+    return [
+        make_instanced_pipeline(uniform_buffer, geometry, framebuffer, instance_buffer, level, i * capacity * stride)
+        for i, level in enumerate(levels[model])
+    ]
+
+
+def make_instanced_pipeline(uniform_buffer, geometry, framebuffer, instance_buffer, level, instance_offset=0):
+    ctx = zengl.context()
+    first, count, error = level
+    return ctx.pipeline(
+        vertex_shader=shaders.source('shaders/mesh.vert'),
+        fragment_shader=shaders.source('shaders/mesh.frag'),
+        layout=[
+            {
+                'name': 'Common',
+                'binding': 0,
+            },
+        ],
+        resources=[
+            {
+                'type': 'uniform_buffer',
+                'binding': 0,
+                'buffer': uniform_buffer,
+            },
+        ],
+        uniforms={
+            'Alpha': 1.0,
+        },
+        includes={
+            'mesh_mode': '#define INSTANCED',
+        },
+        framebuffer=framebuffer,
+        topology='triangles',
+        cull_face='back',
+        vertex_buffers=[
+            *zengl.bind(geometry.vertex_buffer, geometry.layout, 0, 1, 2),
+            *zengl.bind(instance_buffer, '3f 4f /i', 3, 4, offset=instance_offset),
+        ],
+        index_buffer=geometry.index_buffer,
+        short_index=geometry.short_index,
+        first_vertex=first,
+        vertex_count=count,
     )
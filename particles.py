@@ -1,60 +1,136 @@
-import struct
-import zengl
+import numpy as np
+import vmath
+from stream import InstanceStream
+
+CPU_LAYOUT = '3f 4f 1f 3f'
+GPU_LAYOUT = '3f 4f 1f 3f 3f 1f 1f 1f'
+
+# velocities, gravity and lifetimes are per step of the original 60 fps loop
+RATE = 60.0
+
+
+def expiry(data):
+    # the time a gpu particle has lived its lifetime and the vertex shader stops drawing it
+    return data[:, 14] + data[:, 15] / RATE
 
 
 class Particles:
-    def __init__(self, uniform_buffer, model, framebuffer):
-        ctx = zengl.context()
-        self.instance = struct.Struct('3f 4f 1f 3f')
-        self.vertex_buffer = ctx.buffer(open(model, 'rb').read())
-        self.instance_buffer = ctx.buffer(size=self.instance.size * 10000)
-        self.pipeline = ctx.pipeline(
-            vertex_shader=open('shaders/particles.vert').read(),
-            fragment_shader=open('shaders/particles.frag').read(),
-            layout=[
-                {
-                    'name': 'Common',
-                    'binding': 0,
-                },
-            ],
-            resources=[
-                {
-                    'type': 'uniform_buffer',
-                    'binding': 0,
-                    'buffer': uniform_buffer,
-                },
-            ],
-            framebuffer=framebuffer,
-            topology='triangles',
-            cull_face='back',
-            vertex_buffers=[
-                *zengl.bind(self.vertex_buffer, '3f 3f 3f', 0, 1, -1),
-                *zengl.bind(self.instance_buffer, '3f 4f 1f 3f /i', 2, 3, 4, 5),
-            ],
-            vertex_count=self.vertex_buffer.size // zengl.calcsize('3f 3f 3f'),
-        )
-        self.instances = []
+    gravity = 0.01
+
+    def __init__(self, capacity=1024, max_capacity=None, drop_oldest=True, gpu=False, stream=None):
+        self.gpu = gpu
+        # cpu mode keeps live particles packed at the front, gpu mode writes them once into ring slots
+        # gpu mode appends the spawn state the vertex shader needs to evaluate the motion
+        # gpu emitters drawn through Effects pass its stream, the limits are then the ones of that stream
+        if gpu:
+            self.stream = stream or InstanceStream(GPU_LAYOUT, capacity, max_capacity or capacity, drop_oldest, ring=True, expires=expiry)
+            # emitters sharing a ring tell their slots apart by this
+            if 'owner' not in self.stream.arrays:
+                self.stream.add_array('owner', dtype='i8')
+        else:
+            self.stream = InstanceStream(CPU_LAYOUT, capacity, max_capacity, drop_oldest)
+            self.stream.add_array('velocity', 3)
+            self.stream.add_array('previous', 3)
+            self.stream.add_array('alive', dtype=bool)
+        self.now = 0.0
+
+    @property
+    def count(self):
+        # the live particles, a ring also holds expired ones until their slots are written again
+        if self.gpu:
+            n = self.stream.count
+            return int(np.count_nonzero(self.stream.alive(self.now) & (self.stream.arrays['owner'][:n] == id(self))))
+        return self.stream.count
+
+    @property
+    def position(self):
+        return self.stream.data[:, 0:3]
+
+    @property
+    def rotation(self):
+        return self.stream.data[:, 3:7]
+
+    @property
+    def scale(self):
+        return self.stream.data[:, 7]
+
+    @property
+    def color(self):
+        return self.stream.data[:, 8:11]
+
+    @property
+    def velocity(self):
+        return self.stream.data[:, 11:14] if self.gpu else self.stream.arrays['velocity']
+
+    @property
+    def spawn(self):
+        return self.stream.data[:, 14]
+
+    @property
+    def lifetime(self):
+        return self.stream.data[:, 15] if self.gpu else self.stream.arrays['lifetime']
+
+    @property
+    def previous(self):
+        return self.stream.arrays['previous']
+
+    @property
+    def alive(self):
+        return self.stream.arrays['alive']
+
+    def allocate(self, count):
+        i = self.stream.allocate(count, self.now)
+        if self.gpu:
+            self.stream.arrays['owner'][i] = id(self)
+        else:
+            self.alive[i] = True
+        return i
+
+    def spawned(self, i):
+        if not self.gpu:
+            self.previous[i] = self.position[i]
+        if self.gpu:
+            self.spawn[i] = self.now
+            self.stream.data[i, 16] = self.gravity
+            if self.gravity:
+                # steps until the particle falls below z = -1, the cull step() applies on the cpu
+                z = self.position[i, 2] + 1.0
+                v = self.velocity[i, 2] + self.gravity * 0.5
+                self.lifetime[i] = (v + np.sqrt(v * v + 2.0 * self.gravity * z)) / self.gravity
 
     def add(self, position, velocity, rotation, scale, color):
-        self.instances.append([position, velocity, rotation, scale, color])
-
-    def update(self):
-        remove = False
-        for position, velocity, rotation, scale, color in self.instances:
-            position[0] += velocity[0]
-            position[1] += velocity[1]
-            position[2] += velocity[2]
-            velocity[2] -= 0.01
-            if position[2] < -1.0:
-                remove = True
-
-        if remove:
-            self.instances = [x for x in self.instances if x[0][2] >= -1.0]
-
-    def render(self):
-        data = bytearray()
-        for position, velocity, rotation, scale, color in self.instances:
-            data.extend(self.instance.pack(*position, *rotation, scale, *color))
-        self.instance_buffer.write(data)
-        self.pipeline.instance_count = len(self.instances)
-        self.pipeline.render()
+        i = self.allocate(1)
+        self.position[i] = position
+        self.velocity[i] = velocity
+        self.rotation[i] = rotation
+        self.scale[i] = scale
+        self.color[i] = color
+        self.spawned(i)
+        return i
+
+    def emit_burst(self, center, count, speed_range, scale_range, color, drift=(0.0, 0.0, 0.0)):
+        i = self.allocate(count)
+        n = len(i)
+        speed = np.zeros((n, 3))
+        speed[:, 0] = vmath.generator.uniform(*speed_range, n)
+        self.position[i] = center
+        self.velocity[i] = vmath.qtransform_array(vmath.random_quaternions(n), speed) + drift
+        self.rotation[i] = vmath.random_quaternions(n)
+        self.scale[i] = vmath.generator.uniform(*scale_range, n)
+        self.color[i] = color
+        self.spawned(i)
+        return i
+
+    def step(self, steps=1.0):
+        n = self.count
+        self.previous[:n] = self.position[:n]
+        self.position[:n] += self.velocity[:n] * steps
+        self.velocity[:n, 2] -= self.gravity * steps
+        np.greater_equal(self.position[:n, 2], -1.0, out=self.alive[:n])
+        self.stream.keep(self.alive[:n])
+        self.stream.mark(0, self.count)
+
+    def update(self, now=0.0, dt=1.0 / RATE):
+        self.now = now
+        if not self.gpu:
+            self.step(dt * RATE)
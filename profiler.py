@@ -0,0 +1,263 @@
+import collections
+import contextlib
+import csv
+import ctypes
+import json
+import time
+
+import pygame
+import zengl
+
+GL_QUERY_COUNTER_BITS = 0x8864
+GL_QUERY_RESULT = 0x8866
+GL_QUERY_RESULT_AVAILABLE = 0x8867
+GL_TIMESTAMP = 0x8E28
+
+
+class GpuTimer:
+    def __init__(self):
+        # the default loader resolves functions of whatever context is current, windowed or headless
+        loader = zengl.loader()
+
+        def load(name, *args):
+            address = loader.load_opengl_function(name)
+            if not address:
+                raise RuntimeError(f'{name} is not available')
+            return ctypes.CFUNCTYPE(None, *args)(address)
+
+        self.gen_queries = load('glGenQueries', ctypes.c_int, ctypes.POINTER(ctypes.c_uint))
+        self.query_counter = load('glQueryCounter', ctypes.c_uint, ctypes.c_uint)
+        self.get_query = load('glGetQueryiv', ctypes.c_uint, ctypes.c_uint, ctypes.POINTER(ctypes.c_int))
+        self.get_result = load('glGetQueryObjectui64v', ctypes.c_uint, ctypes.c_uint, ctypes.POINTER(ctypes.c_uint64))
+        self.get_integer = load('glGetInteger64v', ctypes.c_uint, ctypes.POINTER(ctypes.c_int64))
+
+        bits = ctypes.c_int()
+        self.get_query(GL_TIMESTAMP, GL_QUERY_COUNTER_BITS, ctypes.byref(bits))
+        if not bits.value:
+            raise RuntimeError('timer queries are not supported')
+
+        # maps gpu timestamps onto the perf_counter timeline
+        now = ctypes.c_int64()
+        self.get_integer(GL_TIMESTAMP, ctypes.byref(now))
+        self.offset = time.perf_counter() - now.value * 1e-9
+        self.free = []
+
+    def timestamp(self):
+        if not self.free:
+            queries = (ctypes.c_uint * 64)()
+            self.gen_queries(64, queries)
+            self.free.extend(queries)
+        query = self.free.pop()
+        self.query_counter(query, GL_TIMESTAMP)
+        return query
+
+    def available(self, query):
+        value = ctypes.c_uint64()
+        self.get_result(query, GL_QUERY_RESULT_AVAILABLE, ctypes.byref(value))
+        return bool(value.value)
+
+    def read(self, query):
+        value = ctypes.c_uint64()
+        self.get_result(query, GL_QUERY_RESULT, ctypes.byref(value))
+        self.free.append(query)
+        return value.value * 1e-9 + self.offset
+
+
+class Instrumented:
+    # stands in for a pipeline, image or renderer and times the methods named in passes
+    def __init__(self, profiler, target, passes):
+        object.__setattr__(self, 'profiler', profiler)
+        object.__setattr__(self, 'target', target)
+        object.__setattr__(self, 'passes', passes)
+
+    def __getattr__(self, name):
+        attr = getattr(self.target, name)
+        if name not in self.passes:
+            return attr
+
+        def timed(*args, **kwargs):
+            with self.profiler.scope(self.passes[name]):
+                return attr(*args, **kwargs)
+
+        return timed
+
+    def __setattr__(self, name, value):
+        setattr(self.target, name, value)
+
+
+class Profiler:
+    def __init__(self, window=120, keep=3600, gpu=True, latency=3):
+        self.window = window
+        self.latency = latency
+        self.gpu = None
+        if gpu:
+            try:
+                self.gpu = GpuTimer()
+            except (RuntimeError, OSError):
+                pass
+        self.origin = time.perf_counter()
+        # an event is [name, depth, cpu start, cpu end, gpu start, gpu end, start query, end query]
+        self.frames = collections.deque(maxlen=keep)
+        self.pending = collections.deque()
+        self.events = []
+        self.stack = []
+        self.frame = 0
+
+    def reset(self):
+        self.flush()
+        self.frames.clear()
+
+    def begin_frame(self):
+        self.events = []
+        self.begin('frame')
+
+    def end_frame(self):
+        self.end()
+        self.frames.append((self.frame, self.events))
+        if self.gpu:
+            self.pending.append(self.events)
+            self.resolve()
+        self.frame += 1
+
+    def begin(self, name):
+        event = [name, len(self.stack), 0.0, 0.0, None, None, None, None]
+        if self.gpu:
+            event[6] = self.gpu.timestamp()
+        event[2] = time.perf_counter()
+        self.stack.append(event)
+        self.events.append(event)
+
+    def end(self):
+        event = self.stack.pop()
+        event[3] = time.perf_counter()
+        if self.gpu:
+            event[7] = self.gpu.timestamp()
+
+    @contextlib.contextmanager
+    def scope(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def instrument(self, target, **passes):
+        return Instrumented(self, target, passes)
+
+    def timed(self, name, func):
+        def timed(*args, **kwargs):
+            with self.scope(name):
+                return func(*args, **kwargs)
+
+        return timed
+
+    def resolve(self, wait=False):
+        # results arrive a few frames late, reading them blocks only once the gpu falls too far behind
+        while self.pending:
+            events = self.pending[0]
+            # the frame event closes last, once its end query is done the whole frame is
+            if not wait and len(self.pending) <= self.latency and not self.gpu.available(events[0][7]):
+                break
+            for event in events:
+                event[4] = self.gpu.read(event[6])
+                event[5] = self.gpu.read(event[7])
+            self.pending.popleft()
+
+    def flush(self):
+        if self.gpu:
+            self.resolve(wait=True)
+
+    def stats(self):
+        samples = {}
+        for _, events in list(self.frames)[-self.window:]:
+            frame = {}
+            for name, depth, cpu_start, cpu_end, gpu_start, gpu_end, _, _ in events:
+                total = frame.setdefault(name, [0, 0.0, None])
+                total[0] += 1
+                total[1] += cpu_end - cpu_start
+                if gpu_start is not None:
+                    total[2] = (total[2] or 0.0) + gpu_end - gpu_start
+            for name, total in frame.items():
+                samples.setdefault(name, []).append(total)
+
+        result = {}
+        for name, totals in samples.items():
+            calls, cpu, gpu = zip(*totals)
+            gpu = [x for x in gpu if x is not None]
+            result[name] = {
+                'frames': len(totals),
+                'calls': sum(calls) / len(totals),
+                'cpu_ms': sum(cpu) / len(cpu) * 1000.0,
+                'cpu_max_ms': max(cpu) * 1000.0,
+                'gpu_ms': sum(gpu) / len(gpu) * 1000.0 if gpu else None,
+                'gpu_max_ms': max(gpu) * 1000.0 if gpu else None,
+            }
+        return result
+
+    def dump_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'pass', 'depth', 'cpu_start_ms', 'cpu_ms', 'gpu_start_ms', 'gpu_ms'])
+            for frame, events in self.frames:
+                for name, depth, cpu_start, cpu_end, gpu_start, gpu_end, _, _ in events:
+                    row = [frame, name, depth, (cpu_start - self.origin) * 1000.0, (cpu_end - cpu_start) * 1000.0, '', '']
+                    if gpu_start is not None:
+                        row[5:] = (gpu_start - self.origin) * 1000.0, (gpu_end - gpu_start) * 1000.0
+                    writer.writerow(row)
+
+    def dump_trace(self, path):
+        # chrome://tracing and perfetto format, cpu passes on one track and gpu passes on another
+        trace = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': 0, 'args': {'name': 'cpu'}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': 1, 'args': {'name': 'gpu'}},
+        ]
+        for frame, events in self.frames:
+            for name, depth, cpu_start, cpu_end, gpu_start, gpu_end, _, _ in events:
+                args = {'frame': frame}
+                trace.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 0, 'ts': (cpu_start - self.origin) * 1e6, 'dur': (cpu_end - cpu_start) * 1e6, 'args': args})
+                if gpu_start is not None:
+                    trace.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 1, 'ts': (gpu_start - self.origin) * 1e6, 'dur': (gpu_end - gpu_start) * 1e6, 'args': args})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+    def dump(self, path):
+        self.flush()
+        if path.endswith('.csv'):
+            self.dump_csv(path)
+        else:
+            self.dump_trace(path)
+
+
+class Overlay:
+    def __init__(self, ctx, profiler, size=(360, 240), interval=0.25):
+        pygame.font.init()
+        self.profiler = profiler
+        self.font = pygame.font.Font(None, 18)
+        self.image = ctx.image(size, 'rgba8unorm')
+        self.size = size
+        self.interval = interval
+        self.updated = 0.0
+        self.visible = False
+
+    def redraw(self):
+        surface = pygame.Surface(self.size, pygame.SRCALPHA)
+        surface.fill((16, 16, 16, 255))
+        rows = [('pass', 'cpu ms', 'gpu ms')]
+        for name, stats in self.profiler.stats().items():
+            gpu = '-' if stats['gpu_ms'] is None else f'{stats["gpu_ms"]:.2f}'
+            rows.append((name, f'{stats["cpu_ms"]:.2f}', gpu))
+        for i, row in enumerate(rows):
+            for x, text in zip((8, 180, 270), row):
+                surface.blit(self.font.render(text, True, (255, 255, 255)), (x, 6 + i * 16))
+        self.image.write(pygame.image.tobytes(surface, 'RGBA', True))
+
+    def render(self, target, size=None):
+        # target None draws straight to the window, which needs its size passed in
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if now - self.updated > self.interval:
+            self.updated = now
+            self.redraw()
+        w, h = size or target.size
+        self.image.blit(target, (8, h - self.size[1] - 8))
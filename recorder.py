@@ -0,0 +1,69 @@
+import struct
+
+import pygame
+
+MAGIC = b'FISHREC1'
+HEADER = struct.Struct('<8sQHH')
+FRAME = struct.Struct('<IhhB')
+EVENT = struct.Struct('<Bi')
+
+# the events handle_event reacts to, each stored as its type and a key or button
+EVENTS = [pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.QUIT]
+
+
+def encode(event):
+    if event.type in (pygame.KEYDOWN, pygame.KEYUP):
+        return EVENT.pack(EVENTS.index(event.type), event.key)
+    if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        return EVENT.pack(EVENTS.index(event.type), event.button)
+    if event.type == pygame.QUIT:
+        return EVENT.pack(EVENTS.index(event.type), 0)
+
+
+def decode(kind, value):
+    kind = EVENTS[kind]
+    if kind in (pygame.KEYDOWN, pygame.KEYUP):
+        return pygame.event.Event(kind, key=value)
+    if kind in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        return pygame.event.Event(kind, button=value)
+    return pygame.event.Event(kind)
+
+
+class Recorder:
+    def __init__(self, path, seed, size):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, seed, *size))
+        self.frames = 0
+
+    def frame(self, ticks, mouse, events):
+        events = [x for x in (encode(event) for event in events) if x]
+        self.file.write(FRAME.pack(ticks, *mouse, len(events)))
+        self.file.write(b''.join(events))
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+
+class Replay:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, self.seed, width, height = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an input recording')
+        self.size = width, height
+        self.frames = []
+        offset = HEADER.size
+        while offset < len(data):
+            ticks, x, y, count = FRAME.unpack_from(data, offset)
+            offset += FRAME.size
+            events = [decode(*EVENT.unpack_from(data, offset + i * EVENT.size)) for i in range(count)]
+            offset += count * EVENT.size
+            self.frames.append((ticks, (x, y), events))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        return iter(self.frames)
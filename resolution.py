@@ -0,0 +1,72 @@
+import collections
+import time
+
+from profiler import GpuTimer
+
+SCALES = (1.0, 0.85, 0.7, 0.6, 0.5)
+
+
+class FrameTimer:
+    # gpu time between two timestamps around the frame, read a few frames late so nothing waits on the driver
+    # without timer queries it falls back to the cpu time spent issuing the frame
+    def __init__(self, latency=3):
+        self.latency = latency
+        self.pending = collections.deque()
+        self.started = 0.0
+        try:
+            self.gpu = GpuTimer()
+        except (RuntimeError, OSError):
+            self.gpu = None
+
+    def begin(self):
+        self.started = time.perf_counter()
+        if self.gpu:
+            self.pending.append([self.gpu.timestamp(), None])
+
+    def end(self):
+        if not self.gpu:
+            return time.perf_counter() - self.started
+        self.pending[-1][1] = self.gpu.timestamp()
+        frame_time = None
+        while len(self.pending) > self.latency or (self.pending and self.gpu.available(self.pending[0][1])):
+            start, end = self.pending.popleft()
+            frame_time = self.gpu.read(end) - self.gpu.read(start)
+        return frame_time
+
+
+class DynamicResolution:
+    # picks the render scale from the recent frame times, only one step at a time and not again until the window refills
+    def __init__(self, scales=SCALES, budget=1.0 / 60.0, window=20, headroom=0.85):
+        self.scales = scales
+        self.budget = budget
+        self.headroom = headroom
+        self.times = collections.deque(maxlen=window)
+        self.index = 0
+
+    @property
+    def scale(self):
+        return self.scales[self.index]
+
+    def update(self, frame_time):
+        if frame_time is None:
+            return False
+        self.times.append(frame_time)
+        if len(self.times) < self.times.maxlen:
+            return False
+
+        average = sum(self.times) / len(self.times)
+        index = self.index
+        if average > self.budget and index + 1 < len(self.scales):
+            index += 1
+        elif index > 0 and average * (self.scales[index - 1] / self.scale) ** 2 < self.budget * self.headroom:
+            # the frame cost follows the pixel count, going up has to leave some room or it bounces right back
+            index -= 1
+
+        if index == self.index:
+            return False
+        self.index = index
+        self.times.clear()
+        return True
+
+    def viewport(self, size):
+        return (0, 0, max(round(size[0] * self.scale), 1), max(round(size[1] * self.scale), 1))
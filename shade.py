@@ -1,11 +1,13 @@
 import zengl
 
+import shaders
+
 
 def make_shade(framebuffer):
     ctx = zengl.context()
     return ctx.pipeline(
-        vertex_shader=open('shaders/shade.vert').read(),
-        fragment_shader=open('shaders/shade.frag').read(),
+        vertex_shader=shaders.source('shaders/shade.vert'),
+        fragment_shader=shaders.source('shaders/shade.frag'),
         uniforms={
             'Color': [0.0, 0.0, 0.0, 0.0],
         },
@@ -0,0 +1,191 @@
+import ctypes
+import functools
+import hashlib
+import json
+import os
+import time
+
+import bundle
+
+GL_VENDOR = 0x1F00
+GL_RENDERER = 0x1F01
+GL_VERSION = 0x1F02
+GL_PROGRAM_BINARY_LENGTH = 0x8741
+GL_PROGRAM_BINARY_RETRIEVABLE_HINT = 0x8257
+GL_COMPILE_STATUS = 0x8B81
+GL_LINK_STATUS = 0x8B82
+
+GLuint = ctypes.c_uint
+GLint = ctypes.c_int
+GLintp = ctypes.POINTER(ctypes.c_int)
+
+
+@functools.cache
+def source(path):
+    # every pipeline asks for its shader text here, each file is read once
+    return bundle.text(path)
+
+
+def warm(pipeline, instances=None):
+    # one draw into an empty viewport makes the driver finish its first-use work for the pipeline without touching a pixel
+    viewport, instance_count = pipeline.viewport, pipeline.instance_count
+    pipeline.viewport = (0, 0, 0, 0)
+    if instances is not None:
+        pipeline.instance_count = instances
+    pipeline.render()
+    pipeline.viewport, pipeline.instance_count = viewport, instance_count
+
+
+class Stats:
+    def __init__(self):
+        self.compiled = 0
+        self.linked = 0
+        self.cached = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        return f'{self.compiled} shaders compiled, {self.linked} programs linked, {self.cached} loaded from cache in {self.seconds * 1000.0:.0f} ms'
+
+
+stats = Stats()
+
+
+class ProgramCache:
+    # wraps a zengl loader, zengl compiles and links through it and linked programs are saved as driver binaries
+    # shaders that appear in a cached program skip compilation, they only compile if the binary is rejected
+    def __init__(self, loader, path='.cache/shaders'):
+        self.loader = loader
+        self.path = path
+        self.wrappers = []
+        self.sources = {}
+        self.attached = {}
+        self.deferred = set()
+        self.driver = None
+        try:
+            with open(os.path.join(path, 'index.json')) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        self.known = {shader for shaders in self.index.values() for shader in shaders}
+
+        self.compile_shader = self.load('glCompileShader', None, GLuint)
+        self.get_shader = self.load('glGetShaderiv', None, GLuint, GLuint, GLintp)
+        self.get_program = self.load('glGetProgramiv', None, GLuint, GLuint, GLintp)
+        self.attach_shader = self.load('glAttachShader', None, GLuint, GLuint)
+        self.link_program = self.load('glLinkProgram', None, GLuint)
+        self.get_string = self.load('glGetString', ctypes.c_char_p, GLuint)
+        self.program_parameter = self.load('glProgramParameteri', None, GLuint, GLuint, GLint)
+        self.get_program_binary = self.load('glGetProgramBinary', None, GLuint, GLint, GLintp, ctypes.POINTER(GLuint), ctypes.c_void_p)
+        self.program_binary = self.load('glProgramBinary', None, GLuint, GLuint, ctypes.c_void_p, GLint)
+        self.shader_source = self.load('glShaderSource', None, GLuint, GLint, ctypes.POINTER(ctypes.c_void_p), GLintp)
+
+        self.hooks = {
+            'glShaderSource': (self.shader_source, self.on_shader_source),
+            'glCompileShader': (self.compile_shader, self.on_compile_shader),
+            'glGetShaderiv': (self.get_shader, self.on_get_shader),
+            'glAttachShader': (self.attach_shader, self.on_attach_shader),
+            'glLinkProgram': (self.link_program, self.on_link_program),
+        }
+
+    def load(self, name, restype, *argtypes):
+        address = self.loader.load_opengl_function(name)
+        if not address:
+            return None
+        return ctypes.CFUNCTYPE(restype, *argtypes)(address)
+
+    def load_opengl_function(self, name):
+        if name not in self.hooks or not all(x for x in (self.program_binary, self.get_program_binary, self.program_parameter)):
+            return self.loader.load_opengl_function(name)
+        original, hook = self.hooks[name]
+        wrapper = type(original)(hook)
+        self.wrappers.append(wrapper)
+        return ctypes.cast(wrapper, ctypes.c_void_p).value
+
+    def on_shader_source(self, shader, count, strings, lengths):
+        parts = []
+        for i in range(count):
+            size = lengths[i] if lengths and lengths[i] >= 0 else None
+            parts.append(ctypes.string_at(strings[i], size) if size is not None else ctypes.string_at(strings[i]))
+        self.sources[shader] = b''.join(parts)
+        self.shader_source(shader, count, strings, lengths)
+
+    def on_compile_shader(self, shader):
+        if hashlib.sha1(self.sources[shader]).hexdigest() in self.known:
+            self.deferred.add(shader)
+            return
+        self.compile(shader)
+
+    def compile(self, shader):
+        start = time.perf_counter()
+        self.compile_shader(shader)
+        stats.seconds += time.perf_counter() - start
+        stats.compiled += 1
+        self.deferred.discard(shader)
+
+    def on_get_shader(self, shader, pname, params):
+        if pname == GL_COMPILE_STATUS and shader in self.deferred:
+            params[0] = 1
+            return
+        self.get_shader(shader, pname, params)
+
+    def on_attach_shader(self, program, shader):
+        self.attached.setdefault(program, []).append(shader)
+        self.attach_shader(program, shader)
+
+    def linked(self, program):
+        status = GLint()
+        self.get_program(program, GL_LINK_STATUS, ctypes.byref(status))
+        return bool(status.value)
+
+    def key(self, shaders):
+        if self.driver is None:
+            self.driver = b'\0'.join(self.get_string(x) or b'' for x in (GL_VENDOR, GL_RENDERER, GL_VERSION))
+        return hashlib.sha1(b'\0'.join([self.driver, *(self.sources[x] for x in shaders)])).hexdigest()
+
+    def on_link_program(self, program):
+        shaders = self.attached.pop(program, [])
+        key = self.key(shaders)
+        start = time.perf_counter()
+
+        if key in self.index:
+            try:
+                with open(os.path.join(self.path, key + '.bin'), 'rb') as f:
+                    data = f.read()
+                self.program_binary(program, int.from_bytes(data[:4], 'little'), data[4:], len(data) - 4)
+                if self.linked(program):
+                    stats.seconds += time.perf_counter() - start
+                    stats.cached += 1
+                    return
+            except OSError:
+                pass
+
+        # no usable binary, fall back to a regular compile and link and save the result
+        for shader in shaders:
+            if shader in self.deferred:
+                self.compile(shader)
+
+        start = time.perf_counter()
+        self.program_parameter(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, 1)
+        self.link_program(program)
+        stats.seconds += time.perf_counter() - start
+        stats.linked += 1
+        if self.linked(program):
+            self.save(program, key, shaders)
+
+    def save(self, program, key, shaders):
+        size = GLint()
+        self.get_program(program, GL_PROGRAM_BINARY_LENGTH, ctypes.byref(size))
+        if not size.value:
+            return
+        data = ctypes.create_string_buffer(size.value)
+        binary_format = GLuint()
+        self.get_program_binary(program, size.value, ctypes.byref(size), ctypes.byref(binary_format), data)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, key + '.bin'), 'wb') as f:
+                f.write(binary_format.value.to_bytes(4, 'little') + data.raw[:size.value])
+            self.index[key] = [hashlib.sha1(self.sources[x]).hexdigest() for x in shaders]
+            with open(os.path.join(self.path, 'index.json'), 'w') as f:
+                json.dump(self.index, f)
+        except OSError:
+            pass
@@ -4,6 +4,7 @@ layout (std140) uniform Common {
     mat4 camera_matrix;
     vec4 camera_position;
     vec4 light_position;
+    float time;
 };
 
 uniform float Alpha;
@@ -1,18 +1,29 @@
 #version 330 core
 
+#include "mesh_mode"
+
 layout (std140) uniform Common {
     mat4 camera_matrix;
     vec4 camera_position;
     vec4 light_position;
+    float time;
 };
 
-uniform vec3 Position;
-uniform vec4 Rotation;
-
 layout (location = 0) in vec3 in_vertex;
 layout (location = 1) in vec3 in_normal;
 layout (location = 2) in vec3 in_color;
 
+#ifdef INSTANCED
+layout (location = 3) in vec3 in_position;
+layout (location = 4) in vec4 in_rotation;
+
+#define Position in_position
+#define Rotation in_rotation
+#else
+uniform vec3 Position;
+uniform vec4 Rotation;
+#endif
+
 out vec3 v_vertex;
 out vec3 v_normal;
 out vec3 v_color;
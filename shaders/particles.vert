@@ -1,9 +1,12 @@
 #version 330 core
 
+#include "particles_mode"
+
 layout (std140) uniform Common {
     mat4 camera_matrix;
     vec4 camera_position;
     vec4 light_position;
+    float time;
 };
 
 layout (location = 0) in vec3 in_vertex;
@@ -14,6 +17,13 @@ layout (location = 3) in vec4 in_rotation;
 layout (location = 4) in float in_scale;
 layout (location = 5) in vec3 in_color;
 
+#ifdef GPU_SIMULATION
+layout (location = 6) in vec3 in_velocity;
+layout (location = 7) in float in_spawn;
+layout (location = 8) in float in_lifetime;
+layout (location = 9) in float in_gravity;
+#endif
+
 out vec3 v_vertex;
 out vec3 v_normal;
 out vec3 v_color;
@@ -23,7 +33,18 @@ vec3 qtransform(vec4 q, vec3 v) {
 }
 
 void main() {
-    v_vertex = in_position + qtransform(in_rotation, in_vertex * in_scale);
+    vec3 position = in_position;
+#ifdef GPU_SIMULATION
+    // the cpu simulation advances one step per 60th of a second
+    // particles spawned in the latest step wait at their origin while rendering trails behind, as on the cpu
+    float age = max((time - in_spawn) * 60.0, 0.0);
+    if (age >= in_lifetime) {
+        gl_Position = vec4(0.0);
+        return;
+    }
+    position += in_velocity * age - vec3(0.0, 0.0, in_gravity * age * (age - 1.0) * 0.5);
+#endif
+    v_vertex = position + qtransform(in_rotation, in_vertex * in_scale);
     v_normal = qtransform(in_rotation, in_normal);
     v_color = in_color;
     gl_Position = camera_matrix * vec4(v_vertex, 1.0);
@@ -4,6 +4,7 @@ layout (std140) uniform Common {
     mat4 camera_matrix;
     vec4 camera_position;
     vec4 light_position;
+    float time;
 };
 
 in vec2 v_vertex;
@@ -14,11 +15,12 @@ layout (location = 0) out vec4 out_color;
 
 uniform float Time;
 uniform float WaterLevel;
+uniform vec2 DepthScale;
 
 #define DRAG_MULT 0.2
 #define WATER_DEPTH 0.5
-#define ITERATIONS_RAYMARCH 5
-#define ITERATIONS_NORMAL 10
+
+#include "water_quality"
 
 vec2 wavedx(vec2 position, vec2 direction, float frequency, float timeshift) {
     float x = dot(direction, position) * frequency + timeshift;
@@ -51,7 +53,7 @@ float get_waves(vec2 position, int iterations) {
 float raymarch_water(vec3 camera, vec3 start, vec3 end, float depth) {
     vec3 pos = start;
     vec3 dir = normalize(end - start);
-    for (int i = 0; i < 64; ++i) {
+    for (int i = 0; i < RAYMARCH_STEPS; ++i) {
         float height = get_waves(pos.xz, ITERATIONS_RAYMARCH) * depth - depth;
         if (height + 0.0002 > pos.y) {
             return distance(pos, camera);
@@ -121,7 +123,7 @@ vec3 from_scene(vec3 v) {
 }
 
 void main() {
-    float depth_ref = texture(Depth, v_vertex * 0.5 + 0.5).r;
+    float depth_ref = texture(Depth, (v_vertex * 0.5 + 0.5) * DepthScale).r;
     float cut_alpha = depth_ref > 0.9999 ? 1.0 : 0.0;
 
     mat4 inv_camera_matrix = inverse(camera_matrix);
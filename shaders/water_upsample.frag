@@ -0,0 +1,36 @@
+#version 330 core
+
+in vec2 v_vertex;
+
+uniform sampler2D Water;
+uniform sampler2D Depth;
+
+uniform vec2 WaterScale;
+uniform vec2 DepthScale;
+
+layout (location = 0) out vec4 out_color;
+
+void main() {
+    // the scales give the part of each texture the current render resolution covers
+    vec2 texture_size = vec2(textureSize(Water, 0));
+    vec2 size = texture_size * WaterScale;
+    vec2 screen = v_vertex * 0.5 + 0.5;
+    float depth = texture(Depth, screen * DepthScale).r;
+
+    // bilinear taps weighted down where the depth the water pass saw differs from this pixel
+    vec2 pos = screen * size - 0.5;
+    vec2 base = floor(pos);
+    vec2 f = pos - base;
+
+    vec4 color = vec4(0.0);
+    float total = 0.0;
+    for (int i = 0; i < 4; ++i) {
+        vec2 offset = vec2(i & 1, i >> 1);
+        vec2 texel = clamp(base + offset, vec2(0.0), size - 1.0);
+        vec2 w2 = mix(1.0 - f, f, offset);
+        float weight = w2.x * w2.y * exp(-abs(texture(Depth, (texel + 0.5) / size * DepthScale).r - depth) * 2000.0) + 1e-6;
+        color += texture(Water, (texel + 0.5) / texture_size) * weight;
+        total += weight;
+    }
+    out_color = color / total;
+}
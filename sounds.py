@@ -1,41 +1,50 @@
+import functools
+
 import pygame
 
+import bundle
+from assets import Assets
+
 pygame.mixer.init()
 pygame.mixer.music.load('assets/metal.ogg')
+pygame.mixer.music.set_volume(0.3)
 
-shooting = pygame.mixer.Sound('assets/shotgun.ogg')
-wave = pygame.mixer.Sound('assets/wave.ogg')
-
-come_back = pygame.mixer.Sound('assets/come-back.ogg')
-endangered = pygame.mixer.Sound('assets/endangered.ogg')
-feeding_fish = pygame.mixer.Sound('assets/feeding-fish.ogg')
-fish_music = pygame.mixer.Sound('assets/fish-music.ogg')
-fisherman = pygame.mixer.Sound('assets/fisherman.ogg')
-fishing = pygame.mixer.Sound('assets/fishing.ogg')
-hobby = pygame.mixer.Sound('assets/hobby.ogg')
-i_am_out = pygame.mixer.Sound('assets/i-am-out.ogg')
-new_specie = pygame.mixer.Sound('assets/new-specie.ogg')
-no_water = pygame.mixer.Sound('assets/no-water.ogg')
-not_fair = pygame.mixer.Sound('assets/not-fair.ogg')
-red_sea = pygame.mixer.Sound('assets/red-sea.ogg')
-reload = pygame.mixer.Sound('assets/reload.ogg')
-sign = pygame.mixer.Sound('assets/sign.ogg')
+# in the order the game first plays them, the voice lines from late in ScenePlay decode last
+SOUNDS = [
+    ('shooting', 'assets/shotgun.ogg', 0.1),
+    ('wave', 'assets/wave.ogg', 0.25),
+    ('sign', 'assets/sign.ogg', 1.0),
+    ('fish_music', 'assets/fish-music.ogg', 1.0),
+    ('fishing', 'assets/fishing.ogg', 1.0),
+    ('red_sea', 'assets/red-sea.ogg', 1.0),
+    ('reload', 'assets/reload.ogg', 1.0),
+    ('hobby', 'assets/hobby.ogg', 1.0),
+    ('feeding_fish', 'assets/feeding-fish.ogg', 1.0),
+    ('endangered', 'assets/endangered.ogg', 1.0),
+    ('not_fair', 'assets/not-fair.ogg', 1.0),
+    ('fisherman', 'assets/fisherman.ogg', 1.0),
+    ('new_specie', 'assets/new-specie.ogg', 1.0),
+    ('i_am_out', 'assets/i-am-out.ogg', 1.0),
+    ('come_back', 'assets/come-back.ogg', 1.0),
+    ('no_water', 'assets/no-water.ogg', 1.0),
+]
 
-pygame.mixer.music.set_volume(0.3)
-shooting.set_volume(0.1)
-wave.set_volume(0.25)
-
-come_back.set_volume(1.0)
-endangered.set_volume(1.0)
-feeding_fish.set_volume(1.0)
-fish_music.set_volume(1.0)
-fisherman.set_volume(1.0)
-fishing.set_volume(1.0)
-hobby.set_volume(1.0)
-i_am_out.set_volume(1.0)
-new_specie.set_volume(1.0)
-no_water.set_volume(1.0)
-not_fair.set_volume(1.0)
-red_sea.set_volume(1.0)
-reload.set_volume(1.0)
-sign.set_volume(1.0)
+
+def load_sound(path, volume):
+    sound = bundle.sound(path)
+    sound.set_volume(volume)
+    return sound
+
+
+assets = Assets()
+
+for name, path, volume in SOUNDS:
+    assets.load(name, functools.partial(load_sound, path, volume))
+
+
+def __getattr__(name):
+    # sounds.name blocks only until that sound is decoded, afterwards it is a plain module attribute
+    if name not in assets.futures:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    globals()[name] = assets.get(name)
+    return globals()[name]
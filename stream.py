@@ -0,0 +1,173 @@
+import numpy as np
+import zengl
+
+
+class InstanceStream:
+    def __init__(self, layout, capacity=1024, max_capacity=None, drop_oldest=True, ring=False, expires=None):
+        self.ctx = zengl.context()
+        self.layout = layout
+        self.stride = zengl.calcsize(layout)
+        self.capacity = capacity
+        self.max_capacity = max_capacity
+        self.drop_oldest = drop_oldest
+        # packed streams keep instances at the front, ring streams write each instance once and move on
+        # expires gives the time the instances in a block of data are done, their slots can then be written again
+        # a ring only grows when no run of free slots fits the instances it is asked for
+        self.ring = ring
+        self.expires = expires
+        if ring and expires is None and not drop_oldest:
+            # without expiry times the stream cannot tell a free slot from a live one
+            raise ValueError('ring streams without expires always recycle their oldest slots, drop_oldest=False needs one')
+        self.arrays = {}
+        self.data = self.add_array('data', self.stride // 4)
+        # created on the first upload, streams used only as storage never allocate one
+        self.buffer = None
+        self.count = 0
+        self.head = 0
+        self.dirty = []
+        self.peak_instances = 0
+        self.frame_bytes = 0
+        self.uploaded_bytes = 0
+        self.reallocations = 0
+        self.dropped = 0
+
+    def add_array(self, name, width=None, dtype='f4'):
+        shape = (self.capacity,) if width is None else (self.capacity, width)
+        self.arrays[name] = np.zeros(shape, dtype)
+        return self.arrays[name]
+
+    def resize(self, capacity):
+        for name, array in self.arrays.items():
+            resized = np.zeros((capacity, *array.shape[1:]), array.dtype)
+            resized[:self.count] = array[:self.count]
+            self.arrays[name] = resized
+        self.data = self.arrays['data']
+        self.capacity = capacity
+        if self.buffer is not None:
+            self.ctx.release(self.buffer)
+            self.buffer = self.ctx.buffer(size=capacity * self.stride)
+        self.reallocations += 1
+        self.dirty = [(0, self.count)]
+
+    def reserve(self, count):
+        # doubles until count fits so a slowly rising peak reallocates rarely, max_capacity caps it when set
+        if count <= self.capacity or (self.max_capacity and self.capacity >= self.max_capacity):
+            return
+        capacity = max(self.capacity, 1)
+        while capacity < count:
+            capacity *= 2
+        self.resize(min(capacity, self.max_capacity) if self.max_capacity else capacity)
+
+    def mark(self, start, stop):
+        if self.dirty and self.dirty[-1][0] <= stop and start <= self.dirty[-1][1]:
+            first, last = self.dirty[-1]
+            self.dirty[-1] = (min(first, start), max(last, stop))
+        else:
+            self.dirty.append((start, stop))
+
+    def clear(self):
+        self.count = 0
+        self.head = 0
+
+    def shift(self, count):
+        for array in self.arrays.values():
+            array[:self.count - count] = array[count:self.count]
+        self.count -= count
+        self.dropped += count
+        self.mark(0, self.count)
+
+    def keep(self, mask):
+        if mask.all():
+            return
+        keep = np.flatnonzero(mask)
+        for array in self.arrays.values():
+            array[:len(keep)] = array[keep]
+        self.count = len(keep)
+        self.mark(0, self.count)
+
+    def expired(self, start, stop, now):
+        # slots past the written extent never held an instance
+        stop = min(stop, self.count)
+        if start >= stop:
+            return True
+        if self.expires is None:
+            return False
+        return not self.alive(now, start, stop).any()
+
+    def alive(self, now, start=0, stop=None):
+        # a nan expiry is an instance that was done before it started
+        return self.expires(self.data[start:self.count if stop is None else stop]) > now
+
+    def allocate(self, count, now=0.0):
+        if self.ring:
+            return self.allocate_ring(count, now)
+
+        start = self.count
+        self.reserve(start + count)
+
+        if start + count > self.capacity:
+            if not self.drop_oldest:
+                self.dropped += count - (self.capacity - start)
+                count = self.capacity - start
+            else:
+                self.dropped += max(count - self.capacity, 0)
+                count = min(count, self.capacity)
+                self.shift(max(start + count - self.capacity, 0))
+                start = self.count
+
+        stop = start + count
+        self.mark(start, stop)
+        self.count = stop
+        self.peak_instances = max(self.peak_instances, self.count)
+        return np.arange(start, stop)
+
+    def free_run(self, count, now):
+        # the first run of count free slots from the head on, wrapping around once
+        if self.head + count <= self.capacity and self.expired(self.head, self.head + count, now):
+            return self.head
+        free = np.ones(self.capacity, bool)
+        free[:self.count] = ~self.alive(now) if self.expires else False
+        sums = np.concatenate([[0], np.cumsum(free)])
+        fits = np.flatnonzero(sums[count:] - sums[:-count] == count)
+        if not len(fits):
+            return None
+        after = fits[fits >= self.head]
+        return int(after[0] if len(after) else fits[0])
+
+    def allocate_ring(self, count, now):
+        # count is the extent of slots ever written, those are the instances drawn
+        # the extent only grows when no run of expired slots fits, so it follows the peak of live instances
+        if self.max_capacity and count > self.max_capacity:
+            self.dropped += count - self.max_capacity
+            count = self.max_capacity
+
+        start = self.free_run(count, now)
+        if start is None:
+            self.reserve(self.count + count)
+            if self.count + count <= self.capacity:
+                start = self.count
+            elif not self.drop_oldest:
+                self.dropped += count
+                return np.arange(0)
+            else:
+                start = self.head if self.head + count <= self.capacity else 0
+                stop = min(start + count, self.count)
+                self.dropped += int(self.alive(now, start, stop).sum()) if self.expires else max(stop - start, 0)
+
+        stop = start + count
+        self.mark(start, stop)
+        self.head = stop % self.capacity
+        self.count = max(self.count, stop)
+        self.peak_instances = max(self.peak_instances, self.count)
+        return np.arange(start, stop)
+
+    def upload(self):
+        if self.buffer is None:
+            self.buffer = self.ctx.buffer(size=self.capacity * self.stride)
+        self.frame_bytes = 0
+        for start, stop in self.dirty:
+            if stop > start:
+                self.buffer.write(self.data[start:stop], offset=start * self.stride)
+                self.frame_bytes += (stop - start) * self.stride
+        self.uploaded_bytes += self.frame_bytes
+        self.dirty.clear()
@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+import pytest
+
+import vmath
+
+
+@pytest.fixture
+def x():
+    rng = np.random.default_rng(0)
+    return {
+        'a': vmath.random_quaternions(1000, rng),
+        'b': vmath.random_quaternions(1000, rng),
+        'u': rng.uniform(-1.0, 1.0, (1000, 3)),
+        'v': rng.uniform(-1.0, 1.0, (1000, 3)),
+        'w': rng.uniform(-1.0, 1.0, (1000, 3)) + 3.0,
+        't': rng.uniform(-3.0, 3.0, 1000),
+    }
+
+
+def feed(monkeypatch, draws):
+    # the scalar versions read random.random, hand them the draws the array version made
+    draws = iter(draws.tolist())
+    monkeypatch.setattr(random, 'random', lambda: next(draws))
+
+
+PAIRS = {
+    'quatmul': (
+        lambda x: [vmath.quatmul(a, b) for a, b in zip(x['a'], x['b'])],
+        lambda x: vmath.quatmul_array(x['a'], x['b']),
+    ),
+    'qtransform': (
+        lambda x: [vmath.qtransform(a, u) for a, u in zip(x['a'], x['u'])],
+        lambda x: vmath.qtransform_array(x['a'], x['u']),
+    ),
+    'axis_angle': (
+        lambda x: [vmath.axis_angle(u, t) for u, t in zip(x['u'], x['t'])],
+        lambda x: vmath.axis_angle_array(x['u'], x['t']),
+    ),
+    'point_line_distance': (
+        lambda x: [vmath.point_line_distance(u, v, w) for u, v, w in zip(x['u'], x['v'], x['w'])],
+        lambda x: vmath.point_line_distance_array(x['u'], x['v'], x['w']),
+    ),
+    'add': (
+        lambda x: [vmath.add(u, v) for u, v in zip(x['u'], x['v'])],
+        lambda x: vmath.add_array(x['u'], x['v']),
+    ),
+}
+
+
+@pytest.mark.parametrize('name', PAIRS)
+def test_array_matches_scalar(name, x):
+    scalar, array = PAIRS[name]
+    np.testing.assert_allclose(array(x), np.array(scalar(x)), rtol=0.0, atol=1e-12)
+
+
+def test_array_accepts_a_single_item(x):
+    np.testing.assert_allclose(vmath.qtransform_array(x['a'][0], x['u'][0]), vmath.qtransform(x['a'][0], x['u'][0]), rtol=0.0, atol=1e-12)
+
+
+def test_random_quaternions_matches_scalar(monkeypatch):
+    quaternions = vmath.random_quaternions(1000, np.random.default_rng(1))
+    # the array version draws u1, u2 and u3 as rows, the scalar one draws them per quaternion
+    feed(monkeypatch, np.random.default_rng(1).random((3, 1000)).T.ravel())
+    np.testing.assert_allclose(quaternions, [vmath.random_quaternion() for _ in range(1000)], rtol=0.0, atol=1e-12)
+    np.testing.assert_allclose(np.linalg.norm(quaternions, axis=1), 1.0)
+
+
+def test_random_vectors_matches_scalar(monkeypatch):
+    vectors = vmath.random_vectors(1000, np.random.default_rng(2))
+    feed(monkeypatch, np.random.default_rng(2).random((1000, 3)).ravel())
+    np.testing.assert_allclose(vectors, [vmath.random_vector() for _ in range(1000)], rtol=0.0, atol=0.0)
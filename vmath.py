@@ -77,6 +77,68 @@ def rand(a, b):
     return random.uniform(a, b)
 
 
+generator = np.random.default_rng()
+
+
+def seed(value):
+    global generator
+    random.seed(value)
+    generator = np.random.default_rng(value)
+
+
+def quatmul_array(a, b):
+    ax, ay, az, aw = np.moveaxis(np.asarray(a), -1, 0)
+    bx, by, bz, bw = np.moveaxis(np.asarray(b), -1, 0)
+    return np.stack([
+        ax * bw + aw * bx + ay * bz - az * by,
+        ay * bw + aw * by + az * bx - ax * bz,
+        az * bw + aw * bz + ax * by - ay * bx,
+        aw * bw - ax * bx - ay * by - az * bz,
+    ], axis=-1)
+
+
+def add_array(a, b):
+    return np.asarray(a) + np.asarray(b)
+
+
+def qtransform_array(q, v):
+    rx, ry, rz, rw = np.moveaxis(np.asarray(q), -1, 0)
+    x, y, z = np.moveaxis(np.asarray(v), -1, 0)
+    return np.stack([
+        (rw * rw + rx * rx - ry * ry - rz * rz) * x + 2.0 * (rx * ry - rw * rz) * y + 2.0 * (rx * rz + rw * ry) * z,
+        2.0 * (rx * ry + rw * rz) * x + (rw * rw - rx * rx + ry * ry - rz * rz) * y + 2.0 * (ry * rz - rw * rx) * z,
+        2.0 * (rx * rz - rw * ry) * x + 2.0 * (ry * rz + rw * rx) * y + (rw * rw - rx * rx - ry * ry + rz * rz) * z,
+    ], axis=-1)
+
+
+def axis_angle_array(axis, angle):
+    axis = np.asarray(axis)
+    angle = np.asarray(angle)[..., None]
+    return np.concatenate([axis * np.sin(angle * 0.5), np.cos(angle * 0.5) * np.ones_like(axis[..., :1])], axis=-1)
+
+
+def point_line_distance_array(p, a, b):
+    p, a, b = np.asarray(p), np.asarray(a), np.asarray(b)
+    c = b - a
+    t = np.sum((p - a) * c, axis=-1) / np.sum(c * c, axis=-1)
+    u = p - a - c * t[..., None]
+    return np.sqrt(np.sum(u * u, axis=-1))
+
+
+def random_vectors(n, rng=None):
+    return (rng or generator).random((n, 3))
+
+
+def random_quaternions(n, rng=None):
+    u1, u2, u3 = (rng or generator).random((3, n))
+    return np.stack([
+        np.sqrt(1.0 - u1) * np.sin(2.0 * pi * u2),
+        np.sqrt(1.0 - u1) * np.cos(2.0 * pi * u2),
+        np.sqrt(u1) * np.sin(2.0 * pi * u3),
+        np.sqrt(u1) * np.cos(2.0 * pi * u3),
+    ], axis=-1)
+
+
 def unproject(eye, target, aspect, fov, x, y):
     mat = zengl.camera(eye, target, aspect=aspect, fov=fov)
     mat = np.frombuffer(mat, dtype='f4').reshape(4, 4).T
@@ -1,11 +1,30 @@
+import struct
+
 import zengl
 
+import shaders
+
+# wave evaluations per raymarch step and per normal sample, raymarch steps and the resolution divisor
+TIERS = {
+    'high': {'raymarch': 5, 'normal': 10, 'steps': 64, 'scale': 1},
+    'medium': {'raymarch': 4, 'normal': 8, 'steps': 32, 'scale': 2},
+    'low': {'raymarch': 3, 'normal': 6, 'steps': 16, 'scale': 4},
+}
 
-def make_water(uniform_buffer, depth_texture, framebuffer):
+
+def make_water(uniform_buffer, depth_texture, framebuffer, tier='high', blending=True):
     ctx = zengl.context()
+    quality = TIERS[tier]
+    blend = None
+    if blending:
+        blend = {
+            'enable': True,
+            'src_color': 'src_alpha',
+            'dst_color': 'one_minus_src_alpha',
+        }
     return ctx.pipeline(
-        vertex_shader=open('shaders/water.vert').read(),
-        fragment_shader=open('shaders/water.frag').read(),
+        vertex_shader=shaders.source('shaders/water.vert'),
+        fragment_shader=shaders.source('shaders/water.frag'),
         layout=[
             {
                 'name': 'Common',
@@ -35,6 +54,60 @@ def make_water(uniform_buffer, depth_texture, framebuffer):
         uniforms={
             'Time': 0.0,
             'WaterLevel': 0.0,
+            'DepthScale': [1.0, 1.0],
+        },
+        includes={
+            'water_quality': '\n'.join([
+                f'#define ITERATIONS_RAYMARCH {quality["raymarch"]}',
+                f'#define ITERATIONS_NORMAL {quality["normal"]}',
+                f'#define RAYMARCH_STEPS {quality["steps"]}',
+            ]),
+        },
+        blend=blend,
+        framebuffer=framebuffer,
+        topology='triangles',
+        vertex_count=3,
+    )
+
+
+def make_upsample(water_texture, depth_texture, framebuffer):
+    ctx = zengl.context()
+    return ctx.pipeline(
+        vertex_shader=shaders.source('shaders/water.vert'),
+        fragment_shader=shaders.source('shaders/water_upsample.frag'),
+        layout=[
+            {
+                'name': 'Water',
+                'binding': 0,
+            },
+            {
+                'name': 'Depth',
+                'binding': 1,
+            },
+        ],
+        resources=[
+            {
+                'type': 'sampler',
+                'binding': 0,
+                'image': water_texture,
+                'wrap_x': 'clamp_to_edge',
+                'wrap_y': 'clamp_to_edge',
+                'min_filter': 'nearest',
+                'mag_filter': 'nearest',
+            },
+            {
+                'type': 'sampler',
+                'binding': 1,
+                'image': depth_texture,
+                'wrap_x': 'clamp_to_edge',
+                'wrap_y': 'clamp_to_edge',
+                'min_filter': 'nearest',
+                'mag_filter': 'nearest',
+            },
+        ],
+        uniforms={
+            'WaterScale': [1.0, 1.0],
+            'DepthScale': [1.0, 1.0],
         },
         blend={
             'enable': True,
@@ -45,3 +118,65 @@ def make_water(uniform_buffer, depth_texture, framebuffer):
         topology='triangles',
         vertex_count=3,
     )
+
+
+class Water:
+    def __init__(self, uniform_buffer, depth_texture, framebuffer, tier='high'):
+        self.uniform_buffer = uniform_buffer
+        self.depth_texture = depth_texture
+        self.framebuffer = framebuffer
+        # every tier built so far, switching back to one reuses its pipelines instead of building them again
+        self.tiers = {}
+        self.tier = None
+        self.viewport = (0, 0, *framebuffer[0].size)
+        self.configure(tier)
+
+    def build(self, tier):
+        ctx = zengl.context()
+        scale = TIERS[tier]['scale']
+        if scale == 1:
+            pipeline = make_water(self.uniform_buffer, self.depth_texture, self.framebuffer, tier)
+            upsample, image = None, None
+        else:
+            # the raymarch writes every pixel of the small target unblended, the upsample blends it into the scene
+            width, height = self.framebuffer[0].size
+            image = ctx.image(((width + scale - 1) // scale, (height + scale - 1) // scale), 'rgba8unorm')
+            pipeline = make_water(self.uniform_buffer, self.depth_texture, [image], tier, blending=False)
+            upsample = make_upsample(image, self.depth_texture, self.framebuffer)
+        # the driver does its first-use work now rather than on the first frame that shows the tier
+        for obj in (pipeline, upsample):
+            if obj is not None:
+                shaders.warm(obj)
+        return pipeline, upsample, image
+
+    def configure(self, tier):
+        if tier == self.tier:
+            return
+        if tier not in self.tiers:
+            self.tiers[tier] = self.build(tier)
+        self.tier = tier
+        self.pipeline, self.upsample, self.image = self.tiers[tier]
+        self.uniforms = self.pipeline.uniforms
+        self.set_viewport(self.viewport)
+
+    def set_viewport(self, viewport):
+        # renders into the corner of the targets that dynamic resolution currently uses
+        self.viewport = viewport
+        _, _, width, height = viewport
+        full_width, full_height = self.framebuffer[0].size
+        depth_scale = struct.pack('2f', width / full_width, height / full_height)
+        self.pipeline.uniforms['DepthScale'][:] = depth_scale
+        if self.upsample is None:
+            self.pipeline.viewport = viewport
+            return
+        scale = TIERS[self.tier]['scale']
+        small_width, small_height = (width + scale - 1) // scale, (height + scale - 1) // scale
+        self.pipeline.viewport = (0, 0, small_width, small_height)
+        self.upsample.viewport = viewport
+        self.upsample.uniforms['WaterScale'][:] = struct.pack('2f', small_width / self.image.size[0], small_height / self.image.size[1])
+        self.upsample.uniforms['DepthScale'][:] = depth_scale
+
+    def render(self):
+        self.pipeline.render()
+        if self.upsample is not None:
+            self.upsample.render()